@@ -0,0 +1,63 @@
+"""Compare the Expander hash_mode choices.
+
+    python benchmarks/hash_modes.py [<copies>] [<repeat>]
+
+The actor test data is replicated `copies` times (default 1000) so that the
+hash functions have something to chew on. For each hash_mode we report the
+time taken by the hash function alone (over every file expand() would write)
+and by a complete expand() into a temporary directory.
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.expander import Expander, xxhash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with open(os.path.join(HERE, "..", "tests", "testresources", "actor-data.json")) as f:
+        actors = json.load(f)
+    data = {f"copy_{i}": actors for i in range(copies)}
+
+    # The bytes of every file that expand() would write.
+    dumps = list()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        JsonExpandOMatic(path=tmpdir).expand(data, root_element="root")
+        for directory, _, filenames in os.walk(tmpdir):
+            for filename in filenames:
+                with open(os.path.join(directory, filename), "rb") as f:
+                    dumps.append(f.read())
+
+    modes = [None, Expander.HASH_MD5, Expander.HASH_BLAKE2B, Expander.HASH_CRC32]
+    if xxhash:
+        modes.append(Expander.HASH_XXHASH)
+
+    logger = logging.getLogger(__name__)
+    print(f"{len(dumps)} files, {sum(len(d) for d in dumps)} bytes")
+    print(f"{'hash_mode':<16}{'hash (s)':>12}{'expand (s)':>12}")
+
+    for mode in modes:
+        expander = Expander(logger=logger, path=".", data={}, leaf_nodes=[], hash_mode=mode)
+        hashing = min(timeit.repeat(lambda: [expander._hash_function(d) for d in dumps], number=1, repeat=repeat))
+
+        def expand():
+            with tempfile.TemporaryDirectory() as tmpdir:
+                JsonExpandOMatic(path=tmpdir, logger=logger).expand(data, root_element="root", hash_mode=mode)
+
+        expanding = min(timeit.repeat(expand, number=1, repeat=repeat))
+
+        print(f"{str(mode):<16}{hashing:>12.4f}{expanding:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare the json codecs.
+
+    python benchmarks/json_codecs.py [<copies>] [<repeat>]
+
+The actor test data is replicated `copies` times (default 1000). For each installed
+codec we report the time taken by dumps() and loads() of every file expand() would
+write and by a complete expand() & contract() of a temporary directory.
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.codec import AUTO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with open(os.path.join(HERE, "..", "tests", "testresources", "actor-data.json")) as f:
+        actors = json.load(f)
+    data = {f"copy_{i}": actors for i in range(copies)}
+
+    # The contents of every file that expand() would write.
+    files = list()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        JsonExpandOMatic(path=tmpdir).expand(data, root_element="root")
+        for directory, _, filenames in os.walk(tmpdir):
+            for filename in filenames:
+                with open(os.path.join(directory, filename), "rb") as f:
+                    files.append(json.loads(f.read()))
+
+    logger = logging.getLogger(__name__)
+    print(f"{len(files)} files")
+    print(f"{'codec':<10}{'dumps (s)':>12}{'loads (s)':>12}{'expand (s)':>12}{'contract (s)':>14}")
+
+    for codec_class, module in reversed(AUTO):
+        if not module:
+            continue
+        codec = codec_class()
+
+        dumps = [codec.dumps(f) for f in files]
+        dumping = min(timeit.repeat(lambda: [codec.dumps(f) for f in files], number=1, repeat=repeat))
+        loading = min(timeit.repeat(lambda: [codec.loads(d) for d in dumps], number=1, repeat=repeat))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            expandomatic = JsonExpandOMatic(path=tmpdir, logger=logger, codec=codec)
+            expanding = min(
+                timeit.repeat(lambda: expandomatic.expand(data, root_element="root"), number=1, repeat=repeat)
+            )
+            contracting = min(
+                timeit.repeat(lambda: expandomatic.contract(root_element="root"), number=1, repeat=repeat)
+            )
+
+        print(f"{codec.NAME:<10}{dumping:>12.4f}{loading:>12.4f}{expanding:>12.4f}{contracting:>14.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Compare expand() and contract() on deep and wide data.
+
+    python benchmarks/shapes.py [<nodes>] [<repeat>]
+
+Each shape has `nodes` (default 1000) dicts:
+  deep -- each dict is the only child of its parent
+  wide -- every dict is a child of the root
+  bushy -- a tree of dicts with (up to) ten children each
+
+Keep `nodes` under ~2000 or the deep shape's file paths will exceed PATH_MAX.
+"""
+
+import logging
+import sys
+import tempfile
+import timeit
+
+from json_expand_o_matic import JsonExpandOMatic
+
+
+def deep(nodes):
+    data = {"value": 0}
+    for i in range(1, nodes):
+        data = {"a": data, "value": i}
+    return data
+
+
+def wide(nodes):
+    return {f"k{i}": {"value": i} for i in range(nodes)}
+
+
+def bushy(nodes):
+    root = {"value": 0}
+    level = [root]
+    count = 1
+    while count < nodes:
+        next_level = list()
+        for parent in level:
+            for i in range(min(10, nodes - count)):
+                parent[f"k{i}"] = {"value": count}
+                next_level.append(parent[f"k{i}"])
+                count += 1
+        level = next_level
+    return root
+
+
+def main():
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    # Our traversals are iterative but shutil.rmtree() (tempfile cleanup) is not.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), nodes + 1000))
+
+    logger = logging.getLogger(__name__)
+
+    print(f"{'shape':<8}{'expand (s)':>12}{'contract (s)':>14}{'pool_size:4 (s)':>18}")
+
+    for shape in [deep, wide, bushy]:
+        data = shape(nodes)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            expandomatic = JsonExpandOMatic(path=tmpdir, logger=logger)
+
+            expanding = min(
+                timeit.repeat(lambda: expandomatic.expand(data, root_element="root"), number=1, repeat=repeat)
+            )
+            contracting = min(
+                timeit.repeat(lambda: expandomatic.contract(root_element="root"), number=1, repeat=repeat)
+            )
+            pooled = min(
+                timeit.repeat(lambda: expandomatic.contract(root_element="root", pool_size=4), number=1, repeat=repeat)
+            )
+
+        print(f"{shape.__name__:<8}{expanding:>12.4f}{contracting:>14.4f}{pooled:>18.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,10 +19,25 @@
 
       Warning: expand() is destructive unless `preserve=True`
 
+      with open(input_file, 'rb') as f:
+        expandomatic.expand_stream(f)
+          Like expand() but parses input_file incrementally (requires ijson).
+
+      with WorkerPool(pool_size=4) as pool:
+        expandomatic.expand(data, pool=pool)
+          Write the files with a pool of processes that outlives the expand().
+
     Contract
 
       data = expandomatic.contract()
 
+      data = expandomatic.contract(lazy=True)
+        Each $ref is loaded the first time it is accessed.
+
+      data = expandomatic.contract(cache=FileCache(max_bytes=2**28))
+        Files that have not changed since a previous contract() are
+        taken from memory. cache=True uses a process-wide FileCache.
+
       import jsonref
       with open(f'{data_path}/root.json') as f:
         data = jsonref.load(f, base_uri=f'file://{os.path.abspath(data_path)}/')
@@ -32,5 +47,7 @@
 """
 
 from .expand_o_matic import JsonExpandOMatic
+from .expansion_pool import WorkerPool
+from .file_cache import FileCache, get_file_cache
 
 VERSION = "v0.2.4"
@@ -1,3 +1,4 @@
+import functools
 import json
 import logging
 import os
@@ -64,17 +65,31 @@ def expand(logger, output_path, input_file, *leaf_nodes_input):
         for key, func, var in [
             ("pool_size", int, "JEOM_POOL_SIZE"),
             ("pool_ratio", float, "JEOM_POOL_RATIO"),
-            ("pool_mode", float, "JEOM_POOL_MODE"),
+            ("pool_mode", str, "JEOM_POOL_MODE"),
+            ("pool_queue_size", int, "JEOM_POOL_QUEUE_SIZE"),
             ("zip_root", str, "JEOM_ZIP_ROOT"),
             ("zip_file", str, "JEOM_ZIP_FILE"),
+            ("zip_compression", str, "JEOM_ZIP_COMPRESSION"),
+            ("zip_compresslevel", int, "JEOM_ZIP_COMPRESSLEVEL"),
+            ("zip_pool_size", int, "JEOM_ZIP_POOL_SIZE"),
+            ("pack_file", str, "JEOM_PACK_FILE"),
+            ("codec", str, "JEOM_CODEC"),
         ]
         if var in os.environ
     }
 
-    JsonExpandOMatic(logger=logger, path=output_path).expand(
-        data=json.load(open(input_file)),
+    expandomatic = JsonExpandOMatic(logger=logger, path=output_path)
+
+    try:
+        import ijson  # type: ignore # noqa: F401
+    except ModuleNotFoundError:
+        do_expand = functools.partial(expandomatic.expand, data=json.load(open(input_file)), preserve=False)
+    else:
+        # Stream the input rather than loading it all into memory.
+        do_expand = functools.partial(expandomatic.expand_stream, fp=open(input_file, "rb"))
+
+    do_expand(
         root_element="root",
-        preserve=False,
         leaf_nodes=leaf_nodes,
         hash_mode=Expander.HASH_MD5,
         **expansion_options
@@ -105,13 +120,26 @@ def expand(logger, output_path, input_file, *leaf_nodes_input):
 
 
 def contract(logger, input_path, root_element="root"):
+    contraction_options = {
+        key: func(os.environ.get(var))
+        for key, func, var in [
+            ("pool_size", int, "JEOM_POOL_SIZE"),
+            ("pool_ratio", float, "JEOM_POOL_RATIO"),
+            ("pool_mode", str, "JEOM_CONTRACT_POOL_MODE"),
+            ("codec", str, "JEOM_CODEC"),
+        ]
+        if var in os.environ
+    }
+
     print(
         json.dumps(
             # You can also contract with jsonref (see the tests).
             # Our contract() method is here for convenience.
             # Due to its simple nature, it is also a bit more lightweight
             # than jsonref.
-            JsonExpandOMatic(logger=logger, path=input_path).contract(root_element=root_element),
+            JsonExpandOMatic(logger=logger, path=input_path).contract(
+                root_element=root_element, **contraction_options
+            ),
             indent=4,
             sort_keys=True,
         )
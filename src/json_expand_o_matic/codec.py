@@ -0,0 +1,175 @@
+"""
+Serialize and parse json with the stdlib or, if installed, a faster library.
+
+    codec = get_codec("orjson", json_dump_kwargs={"sort_keys": True})
+    codec.dumps(data) -> bytes
+    codec.loads(b"...") -> data
+
+Each codec translates the subset of json.dumps()'s keyword arguments that it can
+honour (indent, separators, sort_keys, ensure_ascii) and asserts if it is given
+anything else. The stdlib codec accepts everything json.dumps() does.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional, Union
+
+try:
+    import orjson  # type: ignore
+except ModuleNotFoundError:
+    orjson = None  # type: ignore
+
+try:
+    import msgspec  # type: ignore
+except ModuleNotFoundError:
+    msgspec = None  # type: ignore
+
+try:
+    import ujson  # type: ignore
+except ModuleNotFoundError:
+    ujson = None  # type: ignore
+
+
+class Codec(ABC):
+    NAME = ""
+
+    # json_dump_kwargs used when none are given.
+    DEFAULT_DUMP_KWARGS: dict = {}
+
+    def __init__(self, json_dump_kwargs: Optional[dict] = None):
+        self.json_dump_kwargs = self.DEFAULT_DUMP_KWARGS if json_dump_kwargs is None else json_dump_kwargs
+
+    @abstractmethod
+    def dumps(self, data) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: Union[bytes, str]):
+        pass
+
+    def _indent(self, allowed=(None, 2)):
+        """Check json_dump_kwargs against what we can do and return the indent."""
+
+        kwargs = self.json_dump_kwargs
+        unsupported = set(kwargs.keys()) - {"indent", "separators", "sort_keys", "ensure_ascii"}
+        assert not unsupported, f"The {self.NAME} codec does not support json_dump_kwargs {sorted(unsupported)}"
+
+        indent = kwargs.get("indent")
+        assert indent in allowed, f"The {self.NAME} codec does not support indent={indent!r}"
+
+        # Our output is compact unless indented (where it has the usual ": " separator).
+        separators = kwargs.get("separators")
+        expected = (",", ":") if indent is None else (",", ": ")
+        assert (
+            separators is None or tuple(separators) == expected
+        ), f"The {self.NAME} codec does not support separators={separators!r} with indent={indent!r}"
+
+        return indent
+
+
+class JsonCodec(Codec):
+    """The stdlib's json."""
+
+    NAME = "json"
+    DEFAULT_DUMP_KWARGS = {"indent": "", "sort_keys": False, "separators": (",", ":")}
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data, **self.json_dump_kwargs).encode()
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """orjson writes bytes directly and is the fastest. Its output is always utf-8 (i.e. - ensure_ascii=False)."""
+
+    NAME = "orjson"
+
+    def __init__(self, json_dump_kwargs: Optional[dict] = None):
+        assert orjson, "The orjson codec requires the orjson package"
+        super().__init__(json_dump_kwargs)
+
+        self.option = orjson.OPT_NON_STR_KEYS
+        if self._indent():
+            self.option |= orjson.OPT_INDENT_2
+        if self.json_dump_kwargs.get("sort_keys"):
+            self.option |= orjson.OPT_SORT_KEYS
+
+    def dumps(self, data) -> bytes:
+        try:
+            return orjson.dumps(data, option=self.option)
+        except orjson.JSONEncodeError as e:
+            if "Recursion limit" in str(e):
+                raise RecursionError(str(e)) from e
+            raise
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec(Codec):
+    """msgspec's json. Its output is always utf-8 (i.e. - ensure_ascii=False)."""
+
+    NAME = "msgspec"
+
+    def __init__(self, json_dump_kwargs: Optional[dict] = None):
+        assert msgspec, "The msgspec codec requires the msgspec package"
+        super().__init__(json_dump_kwargs)
+
+        self.indent = self._indent(allowed=(None, 0, 1, 2, 3, 4, 8))
+        self.order: Optional[str] = "sorted" if self.json_dump_kwargs.get("sort_keys") else None
+
+    def dumps(self, data) -> bytes:
+        dumps = msgspec.json.encode(data, order=self.order)  # type: ignore
+        return msgspec.json.format(dumps, indent=self.indent) if self.indent else dumps
+
+    def loads(self, data):
+        return msgspec.json.decode(data)
+
+
+class UjsonCodec(Codec):
+    """ujson."""
+
+    NAME = "ujson"
+
+    def __init__(self, json_dump_kwargs: Optional[dict] = None):
+        assert ujson, "The ujson codec requires the ujson package"
+        super().__init__(json_dump_kwargs)
+
+        self.kwargs = {
+            "indent": self._indent(allowed=(None, 0, 1, 2, 3, 4, 8)) or 0,
+            "sort_keys": self.json_dump_kwargs.get("sort_keys", False),
+            "ensure_ascii": self.json_dump_kwargs.get("ensure_ascii", True),
+            "escape_forward_slashes": False,
+        }
+
+    def dumps(self, data) -> bytes:
+        return ujson.dumps(data, **self.kwargs).encode()
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+CODECS: Dict[str, Callable[[Optional[dict]], Codec]] = {
+    codec.NAME: codec for codec in [JsonCodec, OrjsonCodec, MsgspecCodec, UjsonCodec]
+}
+
+# The fastest first.
+AUTO = [(OrjsonCodec, orjson), (MsgspecCodec, msgspec), (UjsonCodec, ujson), (JsonCodec, json)]
+
+
+def get_codec(codec: Union[str, Codec, None] = None, json_dump_kwargs: Optional[dict] = None) -> Codec:
+    """Return the Codec named `codec` ("json" (the default), "orjson", "msgspec", "ujson" or "auto").
+
+    "auto" is the fastest of those that are installed. If `codec` is already a Codec it is
+    returned as-is (and json_dump_kwargs are ignored).
+    """
+
+    if isinstance(codec, Codec):
+        return codec
+
+    if codec == "auto":
+        return next(c for c, module in AUTO if module)(json_dump_kwargs)
+
+    assert (codec or "json") in CODECS, f"Unknown codec [{codec}]. Choose from {sorted(CODECS.keys())} or 'auto'."
+    return CODECS[codec or "json"](json_dump_kwargs)
@@ -1,7 +1,24 @@
-import json
+import concurrent.futures
+import functools
 import os
+import sys
+import tarfile
+import threading
+import zipfile
+from enum import Enum
 from urllib.parse import urlparse
 
+from .codec import get_codec
+from .expander import Expander, path_component
+from .expansion_packer import PackReader, is_pack
+from .expansion_pool import get_pool_size
+from .file_cache import FileCache, copy_data, get_file_cache
+
+
+class PoolMode(Enum):
+    ThreadPool = "ThreadPool"
+    ProcessPool = "ProcessPool"
+
 
 class Contractor:
     def __init__(self, *, logger, path, root_element, **options):
@@ -10,20 +27,293 @@ class Contractor:
         self.root_element = root_element
 
         self.ref_key = options.get("ref_key", "$ref")
+        self.lazy = options.get("lazy", False)
+
+        # Contract only the subtree at this traversal (e.g. - "/root/actors/charlie_chaplin").
+        self.traversal = options.get("traversal", None)
+        self.codec = get_codec(options.get("codec"))
+
+        # See ExpansionPool
+        self.pool_size = get_pool_size(
+            pool_ratio=options.get("pool_ratio"),
+            pool_size=options.get("pool_size"),
+            pool_disable=options.get("pool_disable", "pool_size" not in options and "pool_ratio" not in options),
+        )
+        self.pool_mode = PoolMode(options.get("pool_mode", PoolMode.ThreadPool))
+
+        assert not (self.lazy and self.pool_size > 1), "Cannot mix lazy and pool_* options."
+
+        # Read the files from a zip, tar or pack archive if `path` is (or is within) one.
+        archive = ArchiveReader.find(path)
+        assert not (
+            archive and self.pool_size > 1 and self.pool_mode == PoolMode.ProcessPool
+        ), f"Cannot contract from an archive with pool_mode {PoolMode.ProcessPool.value}."
+        if archive and is_pack(archive):
+            self.archive = PackReader(archive, codec=self.codec)
+        elif archive:
+            self.archive = ArchiveReader(archive, codec=self.codec)
+        else:
+            self.archive = None
+
+        # Keep the parsed files in (and take them from) a FileCache. True for the process-wide one.
+        cache = options.get("cache", None)
+        self.cache = get_file_cache() if cache is True else None if cache is False else cache
+        assert self.cache is None or isinstance(self.cache, FileCache), "cache must be True or a FileCache"
+        if self.cache is not None and self.archive:
+            # An archive's members are as old as the archive.
+            self.archive_mtime = os.stat(self.archive.archive).st_mtime_ns
+
+        # The expansion's manifest (see Expander), if any and unless manifest=False.
+        # It is only loaded when it is first used. See the manifest property.
+        self._manifest_files = _MISSING if options.get("manifest", True) else None
 
     def execute(self):
-        return self._contract(path=[self.path], data=self._slurp(self.path, f"{self.root_element}.json"))
+        if self.lazy:
+            # The archive (if any) remains open for the LazyDict/LazyList.
+            directory, data = self._select()
+            return self._lazy(path=[directory], data=data)
+        try:
+            if self.pool_size > 1:
+                return self._pooled_contract()
+            return self._contract(load=lambda level: [self._slurp(directory, ref) for _, _, directory, ref in level])
+        finally:
+            if self.archive:
+                self.archive.close()
+
+    @property
+    def manifest(self):
+        """The expansion's manifest, if any: {traversal: [file, size, checksum, leaf_node]}
+
+        Only _select() (with a traversal) and _prefetching() need it so a plain
+        contract() never loads it.
+        """
+
+        if self._manifest_files is _MISSING:
+            self._manifest_files = self._manifest()
+        return self._manifest_files
+
+    def _manifest(self):
+        """Load the manifest or take it from _MANIFESTS if it (or its archive) has not changed since."""
+
+        filename = os.path.join(self.path, f"{path_component(self.root_element)}{Expander.MANIFEST}")
+        try:
+            stat = os.stat(self.archive.archive if self.archive else filename)
+        except FileNotFoundError:
+            return None
+
+        key = (filename, stat.st_mtime_ns, stat.st_size)
+        with _MANIFESTS_LOCK:
+            manifest = _MANIFESTS.pop(key, _MISSING)
+        if manifest is _MISSING:
+            # Read outside of the lock. At worst, two threads both read the same manifest.
+            try:
+                manifest = self._read(filename)["files"]
+            except FileNotFoundError:
+                manifest = None
+
+        with _MANIFESTS_LOCK:
+            _MANIFESTS[key] = manifest
+            while len(_MANIFESTS) > _MANIFESTS_SIZE:
+                del _MANIFESTS[next(iter(_MANIFESTS))]
+
+        return manifest
+
+    def _contract(self, *, load):
+        """Contract breadth-first using `load` to read & parse the files of each level.
+
+        Each level is a list of (container, key, directory, ref) where container[key]
+        is to be replaced by the contents of the file `ref` relative to `directory`.
+        `load(level)` returns the contents of those files in the same order.
+
+        Uses explicit lists (rather than recursion) so that there is no limit to the
+        depth of the data.
+        """
+
+        directory, data = self._select()
+        root = [data]
+        level: list = list()
+        self._find_refs(root, 0, directory, level)
+
+        while level:
+            next_level: list = list()
+            for (container, key, directory, ref), data in zip(level, load(level)):
+                container[key] = data
+                self._find_refs(container, key, os.path.join(directory, os.path.dirname(ref)), next_level)
+            level = next_level
+
+        return root[0]
+
+    def _select(self):
+        """Return (directory, data) for the subtree at self.traversal.
+
+        Without a traversal this is the $ref to the root's file. Otherwise only the
+        files along the traversal are loaded: those of its dicts/lists that were saved
+        as files and that of the subtree itself. Any $refs within the subtree remain
+        to be followed relative to `directory`.
+
+        Each of the traversal's keys is a dict key (or its path_component, i.e. - as
+        it appears in the expansion's file names) or a list index.
+        """
+
+        directory, data = self.path, {self.ref_key: f"{self.root_element}.json"}
+        if not self.traversal:
+            return directory, data
+
+        keys = self.traversal.strip("/").split("/")
+        assert keys[0] == self.root_element, f"[{self.traversal}] is not within [/{self.root_element}]"
+
+        # Start from the file of the longest part of the traversal in the manifest (if any).
+        start = 0
+        for i in range(len(keys), 0, -1):
+            entry = self.manifest and self.manifest.get("/" + "/".join(keys[:i]))
+            if entry:
+                filename = os.path.join(self.path, entry[0])
+                directory, data = os.path.dirname(filename), {self.ref_key: os.path.basename(filename)}
+                start = i - 1
+                break
+
+        for i in range(start, len(keys)):
+            while isinstance(data, dict) and isinstance(data.get(self.ref_key), str):
+                ref = data[self.ref_key]
+                if not self._something_to_follow(self.ref_key, ref):
+                    break
+                data = self._slurp(directory, ref)
+                directory = os.path.join(directory, os.path.dirname(ref))
+
+            if i + 1 < len(keys):
+                data = data[self._key(data, keys[i + 1], "/".join(keys[: i + 2]))]
+
+        return directory, data
+
+    def _key(self, data, key, traversal):
+        """The key (or index) of `data` that is `key` in the traversal."""
 
-    def _contract(self, *, path, data):
         if isinstance(data, list):
-            for k, v in enumerate(data):
-                data[k] = self._contract(path=path, data=v)
+            try:
+                return int(key)
+            except ValueError:
+                raise KeyError(f"[/{traversal}] is not a list index")
+
+        if isinstance(data, dict):
+            if key in data:
+                return key
+            for k in data.keys():
+                if path_component(k) == key:
+                    return k
+
+        raise KeyError(f"[/{traversal}] not found")
+
+    def _pooled_contract(self):
+        """Contract reading & parsing each level's files concurrently."""
+
+        self.logger.info(f"PoolSize: [{self.pool_size}]. Mode [{self.pool_mode.value}].")
+
+        if self.pool_mode == PoolMode.ThreadPool:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+                return self._contract(load=self._prefetching(lambda files: pool.map(self._slurp, files)))
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.pool_size) as pool:
+            return self._contract(
+                load=self._prefetching(
+                    lambda files: self._cached(
+                        files,
+                        lambda misses: pool.map(
+                            functools.partial(_load, codec=self.codec),
+                            misses,
+                            chunksize=max(1, len(misses) // (self.pool_size * 4)),
+                        ),
+                    )
+                )
+            )
+
+    def _cached(self, files, load_files):
+        """Like `load_files(files)` but taking what it can from (and adding the rest to) self.cache.
+
+        _slurp() does this for a single file. This is for those loaded in other processes.
+        """
+
+        if self.cache is None:
+            return load_files(files)
+
+        keys = [self._cache_key(f) for f in files]
+        data = [self.cache.get(key, _MISSING) for key in keys]
+        missing = [i for i, d in enumerate(data) if d is _MISSING]
+        if missing:
+            for i, d in zip(missing, load_files([files[i] for i in missing])):
+                self.cache.put(keys[i], d)
+                data[i] = copy_data(d)
+        return data
+
+    def _prefetching(self, load_files):
+        """Return a `load(level)` for _contract() that uses `load_files(filenames)` to read & parse.
+
+        With a manifest, every file of the subtree being contracted is loaded at once
+        (in a single batch rather than one per level) when the first level is loaded.
+        Each level then takes its files from those, loading any others as it goes.
+        """
 
-        elif isinstance(data, dict):
-            for k, v in data.items():
-                if self._something_to_follow(k, v):
-                    return self._contract(path=path + [os.path.dirname(v)], data=self._slurp(*path, v))
-                data[k] = self._contract(path=path, data=v)
+        prefetched = dict()
+        if self.manifest:
+            prefix = "/" + self.traversal.strip("/") + "/" if self.traversal else "/"
+            files = {
+                os.path.normpath(os.path.join(self.path, entry[0]))
+                for traversal, entry in self.manifest.items()
+                if traversal.startswith(prefix)
+            }
+            prefetched = None
+
+        def load(level):
+            nonlocal prefetched
+            if prefetched is None:
+                self.logger.info(f"Prefetching [{len(files)}] files.")
+                prefetched = dict(zip(files, load_files(list(files))))
+
+            filenames = [os.path.normpath(os.path.join(directory, ref)) for _, _, directory, ref in level]
+
+            # A file (i.e. - a dedup object) may appear more than once but each of its
+            # appearances must be a copy of its own.
+            data = [prefetched.pop(f, _MISSING) for f in filenames]
+            missing = [i for i, d in enumerate(data) if d is _MISSING]
+            if missing:
+                for i, d in zip(missing, load_files([filenames[i] for i in missing])):
+                    data[i] = d
+            return data
+
+        return load
+
+    def _find_refs(self, container, key, directory, refs):
+        """Append (container, key, directory, ref) to `refs` for each $ref within container[key]."""
+
+        stack = [(container, key)]
+        while stack:
+            container, key = stack.pop()
+            data = container[key]
+
+            if isinstance(data, list):
+                stack.extend((data, k) for k in range(len(data)))
+
+            elif isinstance(data, dict):
+                for k, v in data.items():
+                    if self._something_to_follow(k, v):
+                        refs.append((container, key, directory, v))
+                        break
+                else:
+                    stack.extend((data, k) for k in data.keys())
+
+    def _lazy(self, *, path, data):
+        """Wrap `data` in a LazyDict or LazyList, following its $ref (if any) first."""
+
+        if isinstance(data, (LazyDict, LazyList)):
+            return data
+
+        if isinstance(data, dict):
+            ref = data.get(self.ref_key)
+            if ref is not None and self._something_to_follow(self.ref_key, ref):
+                return self._lazy(path=path + [os.path.dirname(ref)], data=self._slurp(*path, ref))
+            return LazyDict(data, contractor=self, path=path)
+
+        if isinstance(data, list):
+            return LazyList(data, contractor=self, path=path)
 
         return data
 
@@ -35,5 +325,253 @@ class Contractor:
         return not (url_details.scheme or url_details.fragment)
 
     def _slurp(self, *args):
-        with open(os.path.join(*args)) as f:
-            return json.load(f)
+        filename = os.path.join(*args)
+        if self.cache is not None:
+            return self.cache.load(self._cache_key(filename), lambda: self._read(filename))
+        return self._read(filename)
+
+    def _read(self, filename):
+        if self.archive:
+            return self.archive.load(filename)
+        return _load(filename, codec=self.codec)
+
+    def _cache_key(self, filename):
+        """(absolute path, mtime, size) of `filename` for self.cache."""
+
+        filename = os.path.abspath(filename)
+        if self.archive:
+            return filename, self.archive_mtime, self.archive.size(filename)
+        stat = os.stat(filename)
+        return filename, stat.st_mtime_ns, stat.st_size
+
+
+# See Contractor._prefetching() and Contractor._manifest()
+_MISSING = object()
+
+# The most recently used manifests by (filename, mtime, size) so that a lookup
+# by path need not load the (potentially large) manifest every time.
+_MANIFESTS: dict = dict()
+_MANIFESTS_SIZE = 8
+_MANIFESTS_LOCK = threading.Lock()
+
+
+def _load(filename, codec):
+    with open(filename, "rb") as f:
+        return codec.loads(f.read())
+
+
+class ArchiveReader:
+    """Read the files of an expansion from a zip or tar archive rather than the filesystem.
+
+    The archive is opened, and its members indexed, only once. The expansion may be
+    anywhere within the archive. e.g. - With zip_root="foo" the Contractor's path
+    would be "{output_path}/{zip_file}/foo".
+    """
+
+    def __init__(self, archive, codec=None):
+        self.archive = archive
+        self.codec = get_codec(codec)
+
+        if zipfile.is_zipfile(archive):
+            self.file = zipfile.ZipFile(archive)
+            self.members = {os.path.normpath(i.filename): i for i in self.file.infolist() if not i.is_dir()}
+            self._read = self.file.read
+        else:
+            self.file = tarfile.open(archive)
+            self.members = {os.path.normpath(i.name): i for i in self.file.getmembers() if i.isfile()}
+            self._read = lambda member: self.file.extractfile(member).read()
+
+        # ZipFile can be read by several threads at once, TarFile cannot.
+        self.lock = threading.Lock() if isinstance(self.file, tarfile.TarFile) else None
+
+    @staticmethod
+    def find(path):
+        """Return the zip, tar or pack archive that `path` is, or is within. Otherwise None."""
+
+        archive = path
+        while not os.path.exists(archive):
+            parent = os.path.dirname(archive)
+            if parent == archive:
+                return None
+            archive = parent
+
+        if os.path.isfile(archive) and (
+            is_pack(archive) or zipfile.is_zipfile(archive) or tarfile.is_tarfile(archive)
+        ):
+            return archive
+        return None
+
+    def load(self, filename):
+        member = self._member(filename)
+        if self.lock:
+            with self.lock:
+                return self.codec.loads(self._read(member))
+        return self.codec.loads(self._read(member))
+
+    def size(self, filename):
+        """The (uncompressed) size of `filename`."""
+        member = self._member(filename)
+        return member.file_size if isinstance(member, zipfile.ZipInfo) else member.size
+
+    def _member(self, filename):
+        try:
+            return self.members[os.path.relpath(os.path.normpath(filename), self.archive)]
+        except KeyError:
+            raise FileNotFoundError(f"[{filename}] is not in [{self.archive}]")
+
+    def close(self):
+        self.file.close()
+
+    def __del__(self):
+        # A lazy contraction's archive is closed when its last LazyDict/LazyList is gone.
+        if hasattr(self, "file"):
+            self.close()
+
+
+class LazyDict(dict):
+    """A dict returned by `Contractor(lazy=True)`.
+
+    Values that are $refs to other files are loaded, contracted and cached
+    the first time they are accessed. Everything else behaves as a dict
+    (including json.dumps() which will load whatever has not yet been loaded).
+
+    Overriding __iter__ keeps dict(), {**lazy} and dict.update() from copying
+    the raw values directly; they use keys() & __getitem__ instead.
+    """
+
+    def __init__(self, data, *, contractor, path):
+        super().__init__(data)
+        self._contractor = contractor
+        self._path = path
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if _unresolved(value):
+            value = self._contractor._lazy(path=self._path, data=value)
+            super().__setitem__(key, value)
+        return value
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        value = self[key]
+        super().__delitem__(key)
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        if _unresolved(value):
+            value = self._contractor._lazy(path=self._path, data=value)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self):
+        """A shallow copy. Whatever has not yet been loaded is loaded by either as it is accessed."""
+        return LazyDict(super().copy(), contractor=self._contractor, path=self._path)
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # type: ignore
+
+
+class LazyList(list):
+    """A list returned by `Contractor(lazy=True)`. See LazyDict."""
+
+    def __init__(self, data, *, contractor, path):
+        super().__init__(data)
+        self._contractor = contractor
+        self._path = path
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        value = super().__getitem__(index)
+        if _unresolved(value):
+            value = self._contractor._lazy(path=self._path, data=value)
+            super().__setitem__(index, value)
+        return value
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def __contains__(self, value):
+        return any(v is value or v == value for v in self)
+
+    def index(self, value, start=0, stop=sys.maxsize):
+        for index in range(*slice(start, stop).indices(len(self))):
+            v = self[index]
+            if v is value or v == value:
+                return index
+        raise ValueError(f"{value!r} is not in list")
+
+    def count(self, value):
+        return sum(1 for v in self if v is value or v == value)
+
+    def remove(self, value):
+        super().__delitem__(self.index(value))
+
+    def sort(self, *, key=None, reverse=False):
+        super().__setitem__(slice(None), sorted(self, key=key, reverse=reverse))
+
+    def __add__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(other) + list(self)
+
+    def __mul__(self, n):
+        return list(self) * n
+
+    __rmul__ = __mul__
+
+    def pop(self, index=-1):
+        value = self[index]
+        super().pop(index)
+        return value
+
+    def copy(self):
+        """A shallow copy. See LazyDict.copy()."""
+        return LazyList(super().copy(), contractor=self._contractor, path=self._path)
+
+    def __eq__(self, other):
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None  # type: ignore
+
+
+def _unresolved(value):
+    """True if `value` is a dict/list that has not yet been through Contractor._lazy()."""
+    return isinstance(value, (dict, list)) and not isinstance(value, (LazyDict, LazyList))
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 
@@ -6,7 +5,7 @@ from .leaf_node import LeafNode
 
 
 class JsonExpandOMatic:
-    def __init__(self, *, path, logger=logging.getLogger(__name__)):
+    def __init__(self, *, path, logger=logging.getLogger(__name__), pool=None, codec=None, cache=None):
         """Expand a dict into a collection of subdirectories and json files.
 
         Parameters
@@ -14,12 +13,26 @@ class JsonExpandOMatic:
         path : str
             Target directory where expand will write the expanded json data
             and/or where contract will find the expanded data to be loaded.
+        pool : WorkerPool
+            A long-lived pool of writers used by each expand() unless it is
+            given a pool of its own.
+        codec : str or Codec
+            The json library used by expand() and contract(): "json" (the
+            default), "orjson", "msgspec", "ujson" or "auto" (the fastest of
+            those installed). See codec.get_codec().
+        cache : bool or FileCache
+            Keep the files read by contract() in memory for subsequent
+            contract()s. True for the process-wide cache (see
+            file_cache.get_file_cache()).
         """
         self.path = path
         self.abspath = os.path.abspath(path)
         self.logger = logger
+        self.pool = pool
+        self.codec = codec
+        self.cache = cache
 
-    def expand(self, data, root_element="root", preserve=True, leaf_nodes=[], **expander_options):
+    def expand(self, data, root_element="root", preserve=True, leaf_nodes=[], pool=None, **expander_options):
         """Expand a dict into a collection of subdirectories and json files.
 
         Creates:
@@ -33,22 +46,25 @@ class JsonExpandOMatic:
         root_element : str
             Name of the element to "wrap around" the data we expand.
         preserve : bool
-            If true, make a deep copy of `data` so that our operation does not
-            change it.
+            If true, do not change `data`. Rather than making a deep copy,
+            each dict/list is copied (shallowly) only when one of its
+            children is replaced by a $ref.
         leaf_nodes : list
             A list of regular expressions.
             Recursion stops if the current path into the data matches an item
             in this list.
+        pool : WorkerPool
+            Write the files with this (rather than self.pool or a pool of
+            processes started just for this expansion).
 
         Returns:
         --------
         dict
             {root_element: data} where `data` is the original data mutated
             to include jsonref elements for its list and dict elements.
+            With preserve, the mutations are made to copies and anything
+            left unchanged is shared with the original data.
         """
-        if preserve:
-            data = json.loads(json.dumps(data))
-
         from .expander import Expander
 
         expander = Expander(
@@ -56,32 +72,119 @@ class JsonExpandOMatic:
             path=self.abspath,
             data={root_element: data},
             leaf_nodes=LeafNode.construct(leaf_nodes),
-            **expander_options,
+            preserve=preserve,
+            **self._expander_options(pool, expander_options),
         )
         result = expander.execute()
         self.hashcodes = expander.hashcodes
 
         return result
 
-    def contract(self, root_element="root"):
+    def expand_stream(self, fp, root_element="root", leaf_nodes=[], pool=None, **expander_options):
+        """Expand a json document read incrementally from `fp` into a collection
+        of subdirectories and json files.
+
+        Unlike `expand()`, the document is never loaded into memory as a whole.
+        It is parsed with ijson and each dict/list is written as soon as it has
+        been read so peak memory tracks the deepest open subtree rather than
+        the size of the document. Requires the `ijson` package.
+
+        The files are written as they are produced (see Expander.execute_stream())
+        except with dedup, incremental or the zip_*/pack_* options which need all
+        of them, and so hold all of them in memory, until the end.
+
+        Creates:
+        - {self.path}/{root_element}.json
+        - {self.path}/{root_element}/...
+
+        Parameters
+        ----------
+        fp : file-like
+            A file (preferably opened in binary mode) containing the json
+            document to be expanded.
+        root_element : str
+            Name of the element to "wrap around" the data we expand.
+        leaf_nodes : list
+            See `expand()`.
+        pool : WorkerPool
+            See `expand()`.
+
+        Returns:
+        --------
+        dict
+            {root_element: {"$ref": ...}}
+        """
+        import ijson  # type: ignore
+
+        from .expander import Expander
+
+        expander = Expander(
+            logger=self.logger,
+            path=self.abspath,
+            data={root_element: None},
+            leaf_nodes=LeafNode.construct(leaf_nodes),
+            **self._expander_options(pool, expander_options),
+        )
+        result = expander.execute_stream(ijson.basic_parse(fp, use_float=True))
+        self.hashcodes = expander.hashcodes
+
+        return result
+
+    def contract(self, root_element="root", lazy=False, path=None, **contractor_options):
         """Contract (un-expand) the results of `expand()` into a dict.
 
         Loads:
         - {self.path}/{root_element}.json
         - {self.path}/{root_element}/...
 
+        self.path may be (or be within) a zip or tar archive in which case the
+        files are read from the archive, e.g. - "{output_path}/{zip_file}" or,
+        with a zip_root, "{output_path}/{zip_file}/{zip_root}".
+
         Parameters
         ----------
         root_element : str
             Name of the element to "wraped around" the data we expanded
             previously. This will not be included in the return value.
+        lazy : bool
+            If true, return a LazyDict/LazyList proxy that loads each $ref
+            the first time it is accessed rather than loading everything now.
+        path : str
+            If given, contract only the subtree at this path into the data
+            (e.g. - "/root/actors/charlie_chaplin"). Only the files along the
+            path, and those of the subtree, are read.
+        contractor_options : dict
+            pool_size, pool_ratio : Read and parse the files of each level of
+                the expanded data concurrently (see ExpansionPool).
+            pool_mode : "ThreadPool" (default) or "ProcessPool".
+            codec : Parse the files with this rather than self.codec.
+            cache : Use this rather than self.cache.
+            manifest : If False, ignore the expansion's manifest (if any).
 
         Returns:
         --------
         dict or list
-            The data that was originally expanded.
+            The data that was originally expanded (or the subtree at `path`).
         """
 
         from .contractor import Contractor
 
-        return Contractor(logger=self.logger, path=self.abspath, root_element=root_element).execute()
+        return Contractor(
+            logger=self.logger,
+            path=self.abspath,
+            root_element=root_element,
+            lazy=lazy,
+            traversal=path,
+            **dict({"codec": self.codec, "cache": self.cache}, **contractor_options),
+        ).execute()
+
+    def _expander_options(self, pool, expander_options):
+        """Add our codec and the WorkerPool, if any, to the Expander's options.
+
+        Our WorkerPool is not used by (and cannot be mixed with) a zip or pack expansion.
+        """
+        expander_options = dict({"codec": self.codec}, **expander_options)
+        if not pool and any(key.startswith(("zip_", "pack_")) for key in expander_options):
+            return expander_options
+        pool = pool or self.pool
+        return dict(expander_options, pool_workers=pool) if pool else expander_options
@@ -1,15 +1,40 @@
 import collections
 import hashlib
+import itertools
 import json
 import os
+import zlib
 
-from .leaf_node import LeafNode
+from .codec import get_codec
+from .leaf_node import LeafNode, LeafNodeMatcher
+
+try:
+    import xxhash  # type: ignore
+except ModuleNotFoundError:
+    xxhash = None  # type: ignore
+
+
+def path_component(key):
+    """Mangle a dict key or list index into the filesystem path component that represents it."""
+    return str(key).replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_")
 
 
 class Expander:
     """Expand a dict or list into one or more json files."""
 
     HASH_MD5 = "HASH_MD5"
+    HASH_BLAKE2B = "HASH_BLAKE2B"
+    HASH_CRC32 = "HASH_CRC32"
+    HASH_XXHASH = "HASH_XXHASH"  # Requires xxhash
+
+    # Where dedup saves its objects (relative to the expansion's path).
+    OBJECTS = "objects"
+
+    # The manifest of each root element is saved as "{root}{MANIFEST}" beside "{root}.json".
+    MANIFEST = ".manifest.json"
+
+    # The default pool_queue_size of execute_stream().
+    STREAM_QUEUE_SIZE = 16
 
     def __init__(self, *, logger, path, data, leaf_nodes, **options):
         assert isinstance(data, dict) or isinstance(data, list)
@@ -21,7 +46,6 @@ class Expander:
 
         self.options = options if options is not None else dict()
 
-        # options will not include pool or zip options when called recursively.
         self.pool_options = {
             # See ExpansionPool
             key: self.options.pop(key)
@@ -33,212 +57,639 @@ class Expander:
             for key in {key for key in self.options.keys() if key.startswith("zip_")}
         }
 
+        self.pack_options = {
+            # See ExpansionPacker
+            key: self.options.pop(key)
+            for key in {key for key in self.options.keys() if key.startswith("pack_")}
+        }
+
         assert (
             (not self.pool_options and not self.zip_options) or self.pool_options or self.zip_options
         ), f"Cannot mix {sorted(self.pool_options.keys())} and {sorted(self.zip_options.keys())}"
+        assert not self.pack_options or not (
+            self.pool_options or self.zip_options
+        ), f"Cannot mix {sorted(self.pack_options.keys())} and pool_*/zip_* options"
 
         self.ref_key = self.options.get("ref_key", "$ref")
 
-        self.json_dump_kwargs = self.options.get(
-            "json_dump_kwargs", {"indent": "", "sort_keys": False, "separators": (",", ":")}
-        )
+        # Leave self.data untouched. Each dict/list is copied (shallowly) the first time
+        # one of its children is replaced by a $ref rather than being changed in place.
+        self.preserve = self.options.get("preserve", False)
+
+        # The json library used to serialize each file (see codec.get_codec()) and its
+        # json.dumps() style kwargs. The default is the stdlib with compact output.
+        self.codec = get_codec(self.options.get("codec"), self.options.get("json_dump_kwargs"))
+        self.json_dump_kwargs = self.codec.json_dump_kwargs
 
         self.hash_mode = self.options.get("hash_mode", None)
         if self.hash_mode == Expander.HASH_MD5:
             self._hash_function = self._hash_md5
+        elif self.hash_mode == Expander.HASH_BLAKE2B:
+            self._hash_function = self._hash_blake2b
+        elif self.hash_mode == Expander.HASH_CRC32:
+            self._hash_function = self._hash_crc32
+        elif self.hash_mode == Expander.HASH_XXHASH:
+            assert xxhash, f"{Expander.HASH_XXHASH} requires the xxhash package"
+            self._hash_function = self._hash_xxhash
         else:
             self._hash_function = lambda *args, **kwargs: (None, None)
 
+        # Compare each file's checksum to the one already on disk and only write
+        # those that have changed. Files left over from a previous expand() that
+        # are no longer part of the expansion are removed.
+        self.incremental = self.options.get("incremental", False)
+        assert not self.incremental or self.hash_mode, "incremental requires a hash_mode"
+        assert not (self.incremental and self.zip_options), "incremental cannot be used with zip_* options"
+        assert not (self.incremental and self.pack_options), "incremental cannot be used with pack_* options"
+
+        # Save each unique dict/list once in a content-addressed objects directory.
+        # See _dump() and _dedup().
+        self.dedup = self.options.get("dedup", False)
+        self.dedup_path = None
+        assert not self.dedup or self.hash_mode, "dedup requires a hash_mode"
+        assert not (self.dedup and self.hash_mode == Expander.HASH_CRC32), "dedup cannot use HASH_CRC32"
+        assert not (self.dedup and self.incremental), "dedup cannot be used with incremental"
+
+        # With a pool_queue_size the files are written as they are produced so there
+        # is no complete work list for incremental and dedup to filter.
+        assert not (
+            self.pool_options.get("pool_queue_size") and (self.incremental or self.dedup)
+        ), "pool_queue_size cannot be used with incremental or dedup"
+
         # Map hashcodes of dict objects to the json files they are saved as.
         #   key   -- hashcode as specified by self.hash_mode
-        #   value -- list of files w/ hashcode
+        #   value -- list of files w/ hashcode (relative to self.path)
         # We can use these in a 2nd pass to create $refs to identical objects.
+        # Every file is registered exactly once, as it is dumped, no matter how
+        # deeply it is nested.
         self.hashcodes = collections.defaultdict(lambda: list())
 
+        # Alternatively, a callable(checksum, file) to which each (checksum, file)
+        # is streamed as it is dumped. self.hashcodes remains empty.
+        self.hashcodes_sink = self.options.get("hashcodes_sink", None)
+
+        # Save a manifest of the files written for each root element. i.e. -
+        #   {"files": {traversal: [file, size, checksum, leaf_node]}}
+        # where `file` is relative to self.path and `leaf_node` is the raw LeafNode,
+        # if any, that caused the file to be written. See Contractor.
+        self.manifest = dict() if self.options.get("manifest", False) else None
+
+        # The work list/queue provided by the ExpansionPool/ExpansionZipper. See _run().
+        self.work: list = list()
+
+        # LeafNodeMatchers by id(leaf_nodes).
+        self._matchers: dict = dict()
+
     def execute(self):
         """Expand self.data into one or more json files."""
 
-        # Replace the _dump() method with a no-op for the root of the data.
-        self._dump = lambda *args: None
+        return self._run(lambda: self._expand(self._root_frame(self.data)))
+
+    def execute_stream(self, events):
+        """Expand the json document described by `events` into one or more json files.
+
+        `events` is an iterable of (event, value) tuples as produced by ijson.basic_parse().
+        self.data must be the root wrapper ({root_element: None}), the document described
+        by `events` becomes the value of its only key.
+
+        Each dict/list is handed to the dump/work pipeline as soon as it is closed so
+        that only the currently open containers (with their already-expanded children
+        replaced by $ref stubs) are held in memory. Leaf nodes matched before recursion
+        are, of course, held in their entirety until they are closed.
+
+        Unless given a pool_queue_size, this uses one of STREAM_QUEUE_SIZE so that each
+        file is written (by the pool, if any, or inline) as soon as it is dumped rather
+        than all of them being held until the end. The dedup and incremental options and
+        the zip_* and pack_* backends need every file before anything is written so,
+        with them, the files are still held in memory.
+        """
+
+        if not (self.dedup or self.incremental or self.zip_options or self.pack_options):
+            self.pool_options.setdefault("pool_queue_size", Expander.STREAM_QUEUE_SIZE)
+
+        return self._run(lambda: self._expand_stream(events))
+
+    def _run(self, traverse):
+        """Setup the pool/zipper, `traverse` the data into its work list and finalize."""
+
+        # The root's keys are the top-level files and directories owned by the expansion.
+        roots = [path_component(key) for key in self.data.keys()]
 
         if self.zip_options:
             from .expansion_zipper import ExpansionZipper
 
-            pool, work = ExpansionZipper(logger=self.logger, output_path=self.path, **self.zip_options).setup()
+            pool, self.work = ExpansionZipper(logger=self.logger, output_path=self.path, **self.zip_options).setup()
             self.path = pool.zip_root
+        elif self.pack_options:
+            from .expansion_packer import ExpansionPacker
+
+            owned = [name for root in roots for name in [root, f"{root}.json", f"{root}{Expander.MANIFEST}"]]
+            pool, self.work = ExpansionPacker(
+                logger=self.logger, output_path=self.path, owned=owned, **self.pack_options
+            ).setup()
         elif self.pool_options:
             from .expansion_pool import ExpansionPool
 
-            pool, work = ExpansionPool(logger=self.logger, **self.pool_options).setup()
+            pool, self.work = ExpansionPool(logger=self.logger, **self.pool_options).setup()
         else:
             from .expansion_pool import ExpansionPool
 
-            pool, work = ExpansionPool(logger=self.logger, pool_disable=True).setup()
+            pool, self.work = ExpansionPool(logger=self.logger, pool_disable=True).setup()
+
+        if self.dedup:
+            self.dedup_path = os.path.join(self.path, Expander.OBJECTS)
+
+        try:
+            expansion = traverse()
+
+            if self.dedup:
+                self._dedup(expansion, self.work)
+
+            if self.incremental:
+                expected = self._skip_unchanged(self.work)
 
-        expansion = self._execute(indent=0, my_path_component=os.path.basename(self.path), traversal="", work=work)
+            self._manifests()
 
-        pool.finalize()
+            pool.finalize()
+        except BaseException:
+            # e.g. - Don't leave a WorkQueue's writers running.
+            pool.abort()
+            raise
+
+        if self.incremental:
+            self._remove_orphans(roots, expected)
 
         self._hashcodes_cleanup()
 
         return expansion
 
-    def _execute(self, traversal, indent, my_path_component, work):
+    def _manifests(self):
+        """Add the manifest of each root element to the work or, if there is none, remove
+        any left over from a previous expansion (it would no longer be accurate).
+        """
+
+        for key in self.data.keys():
+            data_file = f"{path_component(key)}{Expander.MANIFEST}"
+
+            if self.manifest is None:
+                if not (self.zip_options or self.pack_options):
+                    try:
+                        os.remove(os.path.join(self.path, data_file))
+                    except FileNotFoundError:
+                        pass
+                continue
+
+            prefix = f"/{key}"
+            files = {
+                traversal: entry
+                for traversal, entry in self.manifest.items()
+                if traversal == prefix or traversal.startswith(f"{prefix}/")
+            }
+            self.work.append(
+                (self.path, data_file, json.dumps({"files": files}, separators=(",", ":")).encode(), None, None)
+            )
+
+    def _root_frame(self, data):
+        # The root of the data is not dumped.
+        return Frame(path=self.path, data=data, traversal="", indent=0, leaf_nodes=self.leaf_nodes, dump=False)
+
+    def _expand(self, frame):
         """Main...
 
+        Depth-first traversal of frame.data using an explicit stack (rather
+        than recursion) so that there is no limit to the depth of the data.
+        Each stack entry is [frame, keys, key, owned] where `keys` iterates
+        over the keys of frame.data, `key` is that of the child currently
+        being expanded and `owned` is True once frame.data may be changed
+        in place (always, unless self.preserve).
+
         Parameters
         ----------
-        indent : int
-            Used to indent log messages so that we can see the data tree.
-        traversal : string
-            A '/' separated path into the json doc.
-            This is ${path} with self.path removed & is what we match against
-            the self.leaf_nodes regular expressions.
-        my_path_component : string
-            This is the filesystem path component that represents self.data
-            It is os.path.basename(self.path) with some mangling applied.
+        frame : Frame
+            The dict or list to be expanded and where it is in the json doc.
 
         Returns:
         --------
         dict
-            data
+            frame.data or, if it was dumped, a $ref to its file.
         """
 
-        self.indent = indent
-        self.my_path_component = my_path_component
-        self.traversal = traversal
-        self.work = work
+        stack: list = []
+        child = frame
+
+        while True:
+            if child:
+                self._log(child, f"path [{child.path}] traversal [{child.traversal}]")
+
+                if self._is_leaf_node(child, LeafNode.When.BEFORE):
+                    value = child.data
+                else:
+                    stack.append([child, self._data_iter(child.data), None, not self.preserve])
+                    value = None
+                child = None
+            else:
+                parent, keys, _, _ = top = stack[-1]
+                for key in keys:
+                    child = self._child_frame(parent, key)
+                    if child:
+                        top[2] = key
+                        break
 
-        self._log(f"path [{self.path}] traversal [{self.traversal}]")
+                if child:
+                    continue
 
-        if self._is_leaf_node(LeafNode.When.BEFORE):
-            return self.data
+                stack.pop()
+                value = self._leave(parent)
 
-        for key in self._data_iter():
-            self._recursively_expand(key=key)
+            if value is None:
+                continue
+
+            if not stack:
+                return value
+
+            parent, _, key, owned = top = stack[-1]
+            if value is parent.data[key]:
+                continue
+            if not owned:
+                # Copy on write.
+                parent.data = parent.data.copy()
+                top[3] = True
+            parent.data[key] = value
 
-        if self._is_leaf_node(LeafNode.When.AFTER):
-            return self.data
+    def _leave(self, frame):
+        """Finish frame.data after its children have been expanded."""
+
+        if self._is_leaf_node(frame, LeafNode.When.AFTER):
+            return frame.data
 
         # If no LeafNode has matched, our default
-        # action is to dump self.data to a file.
-        self._dump()
+        # action is to dump frame.data to a file.
+        self._dump(frame)
 
-        return self.data
+        return frame.data
 
     ########################################
 
-    def _data_iter(self):
-        if isinstance(self.data, dict):
-            for key in sorted(self.data.keys()):
+    def _data_iter(self, data):
+        if isinstance(data, dict):
+            for key in sorted(data.keys()):
                 yield key
 
-        elif isinstance(self.data, list):
-            for key, _ in enumerate(self.data):
+        elif isinstance(data, list):
+            for key, _ in enumerate(data):
                 yield key
 
         return None
 
-    def _dump(self, leaf_node=None):
-        """Dump self.data to "{self.path}.json" if leaf_node.WHAT == LeafNode.What.DUMP
-        and set self.data = {"$ref": f"{directory}/{filename}"}
+    def _dump(self, frame, leaf_node=None):
+        """Dump frame.data to "{frame.path}.json" if leaf_node.WHAT == LeafNode.What.DUMP
+        and set frame.data = {"$ref": f"{directory}/{filename}"}
 
-        if self.hash_mode, calculate a hashcode for "{self.path}.json" and save
-        as "{self.path}.xxx" (where `xxx` depends on the hash function selected).
+        if self.hash_mode, calculate a hashcode for "{frame.path}.json" and save
+        as "{frame.path}.xxx" (where `xxx` depends on the hash function selected).
 
         Always returns True so that _is_leaf_node() is less gross.
         """
 
-        if leaf_node and not leaf_node.WHAT == LeafNode.What.DUMP:
+        if not frame.dump or (leaf_node and not leaf_node.WHAT == LeafNode.What.DUMP):
             return True
 
-        dumps = json.dumps(self.data, **self.json_dump_kwargs)
+        # Encode once. The same bytes are hashed and written.
+        dumps = self.codec.dumps(frame.data)
 
-        directory = os.path.dirname(self.path)
-        filename = os.path.basename(self.path)
+        directory = os.path.dirname(frame.path)
+        filename = os.path.basename(frame.path)
         data_file = f"{filename}.json"
 
         checksum, checksumfile_suffix = self._hash_function(dumps)
         checksum_file = f"{filename}.{checksumfile_suffix}"
 
+        if self.dedup:
+            # Every dict/list is saved as "{checksum}.json" in the objects directory where
+            # identical ones collapse into a single file. Its $ref is relative to the objects
+            # directory because that is where the files referring to it live.
+            self._hashcode(checksum, os.path.join(directory, data_file))
+            self.work.append((self.dedup_path, f"{checksum}.json", dumps, None, None))
+            self._manifest(frame, os.path.join(self.dedup_path, f"{checksum}.json"), dumps, checksum, leaf_node)
+            frame.dumped = frame.data
+            frame.data = {self.ref_key: f"{checksum}.json"}
+            return True
+
         if checksum:
             self.work.append((directory, data_file, dumps, checksum_file, checksum))
-            self.hashcodes[checksum].append(data_file)
+            self._hashcode(checksum, os.path.join(directory, data_file))
         else:
             self.work.append((directory, data_file, dumps, None, None))
+        self._manifest(frame, os.path.join(directory, data_file), dumps, checksum, leaf_node)
 
         # Build a reference to the file we just wrote.
         directory = os.path.basename(directory)
         data_file = os.path.basename(data_file)
-        self.data = {self.ref_key: f"{directory}/{data_file}"}
+        frame.dumped = frame.data
+        frame.data = {self.ref_key: f"{directory}/{data_file}"}
 
         return True
 
-    def _hashcodes_cleanup(self):
-        """Strip self.path from the hashcodes' files in case we want to make $refs from them.
-        Also removes any entries having less than two files.
+    def _dedup(self, expansion, work):
+        """Remove duplicate and pre-existing objects from `work` and create the root's files.
+
+        Each root file is a $ref to its object so that contract() & friends can find it
+        where they expect it.
+        """
+
+        written = set()
+        unique = list()
+        for w in work:
+            filename = os.path.join(w[0], w[1])
+            if filename in written or (not (self.zip_options or self.pack_options) and os.path.exists(filename)):
+                continue
+            written.add(filename)
+            unique.append(w)
+
+        self.logger.info(f"Dedup: [{len(unique)}] of [{len(work)}] objects to be written.")
+        work[:] = unique
+
+        for key, value in expansion.items():
+            if not (isinstance(value, dict) and self.ref_key in value):
+                continue
+            component = path_component(key)
+            work.append(
+                (
+                    self.path,
+                    f"{component}.json",
+                    self.codec.dumps({self.ref_key: f"{Expander.OBJECTS}/{value[self.ref_key]}"}),
+                    None,
+                    None,
+                )
+            )
+            expansion[key] = {self.ref_key: f"{os.path.basename(self.path)}/{component}.json"}
+
+    def _skip_unchanged(self, work):
+        """Remove from `work` the files whose checksum file already has their checksum.
+
+        Returns the set of all files (written or not) that are part of the expansion.
+        """
+
+        # If a file appears more than once the last one wins.
+        latest = dict()
+        for w in work:
+            latest[(w[0], w[1])] = w
+
+        expected = set()
+        changed = list()
+        for directory, data_file, dumps, checksum_file, checksum in latest.values():
+            expected.add(os.path.join(directory, data_file))
+            expected.add(os.path.join(directory, checksum_file))
+
+            try:
+                with open(os.path.join(directory, checksum_file)) as f:
+                    if f.read() == checksum and os.path.exists(os.path.join(directory, data_file)):
+                        continue
+            except FileNotFoundError:
+                pass
+
+            changed.append((directory, data_file, dumps, checksum_file, checksum))
+
+        self.logger.info(f"Incremental: [{len(changed)}] of [{len(latest)}] files changed.")
+        work[:] = changed
+
+        return expected
+
+    def _remove_orphans(self, roots, expected):
+        """Remove the files (and then empty directories) below `roots` that are not `expected`."""
+
+        suffixes = {".json"} | {os.path.splitext(f)[1] for f in expected if not f.endswith(".json")}
+
+        candidates = [os.path.join(self.path, f"{root}{suffix}") for root in roots for suffix in suffixes]
+        candidates = [f for f in candidates if os.path.exists(f)]
+        for root in roots:
+            for directory, _, filenames in os.walk(os.path.join(self.path, root)):
+                candidates.extend(os.path.join(directory, filename) for filename in filenames)
+
+        orphans = [f for f in candidates if f not in expected and os.path.splitext(f)[1] in suffixes]
+        for orphan in orphans:
+            os.remove(orphan)
+
+        for root in roots:
+            for directory, _, _ in os.walk(os.path.join(self.path, root), topdown=False):
+                if not os.listdir(directory):
+                    os.rmdir(directory)
+
+        self.logger.info(f"Incremental: Removed [{len(orphans)}] files.")
+
+    def _hashcode(self, checksum, filename):
+        """Register `filename` as having `checksum`.
+        self.path is stripped from `filename` in case we want to make $refs from it.
         """
-        l = len(self.path) + 1  # noqa: E741
-        self.hashcodes = {k: [f[l:] for f in v] for k, v in self.hashcodes.items() if len(v) > 1}
+        filename = filename[len(self.path) + 1 :]
+        if self.hashcodes_sink:
+            self.hashcodes_sink(checksum, filename)
+        else:
+            self.hashcodes[checksum].append(filename)
+
+    def _manifest(self, frame, filename, dumps, checksum, leaf_node):
+        """Record that `filename` holds the data at frame.absolute."""
+        if self.manifest is not None:
+            self.manifest[frame.absolute] = [
+                filename[len(self.path) + 1 :],
+                len(dumps),
+                checksum,
+                leaf_node.raw if leaf_node else None,
+            ]
+
+    def _hashcodes_cleanup(self):
+        """Remove any entries having less than two files."""
+        self.hashcodes = {k: v for k, v in self.hashcodes.items() if len(v) > 1}
 
     def _hash_md5(self, dumps):
         """Compute and save the md5 hashcode of `dumps`.
         Returns checksum.
         """
-        checksum = hashlib.md5(dumps.encode()).hexdigest()
+        checksum = hashlib.md5(dumps).hexdigest()
         return checksum, "md5"
 
-    def _is_leaf_node(self, when):
-        for c in self.leaf_nodes:
-            if c.comment or not c.match(string=self.traversal, when=when):
+    def _hash_blake2b(self, dumps):
+        """Compute the 128-bit blake2b hashcode of `dumps`."""
+        checksum = hashlib.blake2b(dumps, digest_size=16).hexdigest()
+        return checksum, "blake2b"
+
+    def _hash_crc32(self, dumps):
+        """Compute the crc32 of `dumps`.
+        Cheapest of the lot but only suitable for change detection, not dedup.
+        """
+        checksum = f"{zlib.crc32(dumps):08x}"
+        return checksum, "crc32"
+
+    def _hash_xxhash(self, dumps):
+        """Compute the 128-bit xxh3 hashcode of `dumps`."""
+        checksum = xxhash.xxh3_128_hexdigest(dumps)
+        return checksum, "xxh3"
+
+    def _expand_stream(self, events):
+        """Streaming equivalent of _expand() for the root of the data.
+
+        Each open dict/list is represented on an explicit stack by:
+          [frame, container, key, leaf_node]
+        where `frame` is None for the descendants of a leaf node (they are
+        collected as-is) and `key` is the most recent map_key of a dict.
+        """
+
+        (root_element,) = self.data.keys()
+        events = itertools.chain([("start_map", None), ("map_key", root_element)], events, [("end_map", None)])
+
+        stack: list = []
+        expansion = None
+
+        for event, value in events:
+            if event == "map_key":
+                stack[-1][2] = value
+                continue
+
+            if event == "start_map" or event == "start_array":
+                container = dict() if event == "start_map" else list()
+
+                if not stack:
+                    frame = self._root_frame(container)
+                elif stack[-1][0] is None or stack[-1][3]:
+                    frame = None
+                else:
+                    parent = stack[-1][0]
+                    key = stack[-1][2] if isinstance(stack[-1][1], dict) else len(stack[-1][1])
+                    frame = parent.child(key, container)
+
+                if frame:
+                    self._log(frame, f"path [{frame.path}] traversal [{frame.traversal}]")
+                leaf_node = self._leaf_node(frame, LeafNode.When.BEFORE) if frame else None
+                stack.append([frame, container, None, leaf_node])
                 continue
 
-            if not c.children:
-                return self._dump(c)
+            if event == "end_map" or event == "end_array":
+                frame, value, _, leaf_node = stack.pop()
 
-            self._log(f">>> Expand children of [{c.raw}]")
-            expander = self._recursion_instance(
-                path=os.path.dirname(self.path), data={os.path.basename(self.path): self.data}, leaf_nodes=c.children
-            )
-            expander._execute(
-                indent=self.indent + 2, my_path_component=os.path.basename(self.path), traversal="", work=self.work
-            )
-            self._log(f"<<< Expand children of [{c.raw}]")
+                if frame:
+                    frame.data = value
+                    if leaf_node:
+                        self._apply_leaf_node(frame, leaf_node)
+                    else:
+                        self._leave(frame)
+                    value = frame.data
 
-            return self._dump(c)
+                if not stack:
+                    expansion = value
+                    continue
 
-        return False
+            parent_container = stack[-1][1]
+            if isinstance(parent_container, dict):
+                parent_container[stack[-1][2]] = value
+            else:
+                parent_container.append(value)
 
-    def _log(self, string):
-        self.logger.debug(" " * self.indent + string)
+        return expansion
 
-    def _recursively_expand(self, *, key):
-        if not (isinstance(self.data[key], dict) or isinstance(self.data[key], list)):
-            return
+    def _is_leaf_node(self, frame, when):
+        c = self._leaf_node(frame, when)
+        if not c:
+            return False
 
-        path_component = str(key).replace(":", "_").replace("/", "_").replace("\\", "_").replace(" ", "_")
+        return self._apply_leaf_node(frame, c)
 
-        expander = self._recursion_instance(
-            path=os.path.join(self.path, path_component), data=self.data[key], leaf_nodes=self.leaf_nodes
-        )
-        self.data[key] = expander._execute(
-            indent=self.indent + 2,
-            my_path_component=path_component,
-            traversal=f"{self.traversal}/{key}",
-            work=self.work,
+    def _leaf_node(self, frame, when):
+        """Return the first LeafNode matching frame.traversal or None."""
+
+        matcher = self._matchers.get(id(frame.leaf_nodes))
+        if not matcher:
+            matcher = self._matchers[id(frame.leaf_nodes)] = LeafNodeMatcher.get(frame.leaf_nodes)
+
+        return matcher.match(string=frame.traversal, when=when)
+
+    def _apply_leaf_node(self, frame, c):
+        """Take the action described by `c` on frame.data."""
+
+        if not c.children:
+            return self._dump(frame, c)
+
+        self._log(frame, f">>> Expand children of [{c.raw}]")
+        # frame.data as the only child of an (imaginary) root so that c.children
+        # are matched against "/{name}/...".
+        child = Frame(
+            path=frame.path,
+            data=frame.data,
+            traversal=f"/{os.path.basename(frame.path)}",
+            indent=frame.indent + 2,
+            leaf_nodes=c.children,
+            absolute=frame.absolute,
         )
+        value = self._expand(child)
+        self._log(frame, f"<<< Expand children of [{c.raw}]")
+
+        if child.dumped is None:
+            frame.data = value
+        elif c.WHAT == LeafNode.What.DUMP:
+            # frame.data has already been dumped by the expansion of its children.
+            frame.dumped, frame.data = child.dumped, value
+            if self.manifest is not None:
+                self.manifest[frame.absolute][3] = c.raw
+            return True
+        else:
+            frame.data = child.dumped
 
-        # Add the child's hashcodes to our own so that when we unroll the recursion the root
-        # will not need to recurse again to collect the entire list.
-        for hashcode in expander.hashcodes:
-            if hashcode in self.hashcodes:
-                self.hashcodes[hashcode] += expander.hashcodes[hashcode]
-            else:
-                self.hashcodes[hashcode] = expander.hashcodes[hashcode]
+        return self._dump(frame, c)
+
+    def _log(self, frame, string):
+        self.logger.debug(" " * frame.indent + string)
+
+    def _child_frame(self, frame, key):
+        """Return a Frame for frame.data[key] or None if it is not a dict/list."""
+
+        data = frame.data[key]
+        if not (isinstance(data, dict) or isinstance(data, list)):
+            return None
 
-    def _recursion_instance(self, *, path, data, leaf_nodes):  # key, path_component):
-        expander = Expander(logger=self.logger, path=path, data=data, leaf_nodes=leaf_nodes, **self.options)
+        return frame.child(key, data)
 
-        return expander
 
-        # self.data[key] = {"$ref": f"{self.my_path_component}/{path_component}.json"}
+class Frame:
+    """A dict or list being expanded and where it is in the json doc.
+
+    path : str
+        The filesystem path (without the .json suffix) that represents data.
+    data : dict or list
+        The data itself.
+    traversal : str
+        A '/' separated path into the json doc.
+        This is what we match against the leaf_nodes regular expressions.
+    indent : int
+        Used to indent log messages so that we can see the data tree.
+    leaf_nodes : list
+        The LeafNodes that apply to data.
+    dump : bool
+        False for the root of the data which is never written.
+    dumped : dict or list
+        The data that was written (if it has been) now that `data` is its $ref.
+    absolute : str
+        The traversal from the root of the data. This differs from `traversal`
+        when a leaf node's children are being expanded.
+    """
+
+    __slots__ = ("path", "data", "traversal", "indent", "leaf_nodes", "dump", "dumped", "absolute")
+
+    def __init__(self, *, path, data, traversal, indent, leaf_nodes, dump=True, absolute=None):
+        self.path = path
+        self.data = data
+        self.traversal = traversal
+        self.absolute = traversal if absolute is None else absolute
+        self.indent = indent
+        self.leaf_nodes = leaf_nodes
+        self.dump = dump
+        self.dumped = None
+
+    def child(self, key, data):
+        """Return a Frame for `data`, the value of our data's `key`."""
+        return Frame(
+            path=os.path.join(self.path, path_component(key)),
+            data=data,
+            traversal=f"{self.traversal}/{key}",
+            indent=self.indent + 2,
+            leaf_nodes=self.leaf_nodes,
+            absolute=None if self.absolute == self.traversal else f"{self.absolute}/{key}",
+        )
@@ -0,0 +1,199 @@
+"""
+Save the expansion in a single pack file rather than a collection of files.
+
+A pack file is:
+  MAGIC
+  The data of each file, one after another.
+  The index: json {"files": {path: [offset, length, checksum]}} where path is relative
+    to the expansion's path (e.g. - "root.json", "root/actors.json").
+  The trailer: the index's offset and length (little-endian uint64) followed by MAGIC.
+
+Files are only ever appended and the index is written last so that a pack can be written
+in a single pass. PackReader mmaps the pack and reads its index from the trailer.
+
+A pack may hold several root elements. Expanding into an existing pack appends the new
+files in place of its index and then writes a new index (and trailer) after them. The
+cost is that of the new files (and the index) no matter how large the pack is. Files
+of a root element that is expanded again are dropped from the index but their data
+remains in the pack until it is compacted (pack_compact=True) which rewrites the pack,
+less that data, into a temporary file that then replaces it.
+
+A pack must not be expanded into while it is being read: appending changes it in place.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Iterable, Optional, Tuple
+
+from .codec import get_codec
+
+MAGIC = b"JEOMPACK\x00\x01"
+TRAILER = struct.Struct(f"<QQ{len(MAGIC)}s")
+
+
+class ExpansionPacker:
+    def __init__(
+        self,
+        *,
+        logger: logging.Logger,
+        output_path: str,  # ........... Where the files would otherwise be written.
+        pack_file: Optional[str] = None,  # Name of the pack file to create in output_path's parent.
+        pack_compact: bool = False,  # ..... Rewrite the pack without the data of replaced files.
+        owned: Iterable[str] = (),  # ...... Top-level files & directories replaced by this expansion.
+    ):
+        assert logger, "logger is required"
+        self.logger = logger
+        self.work: list = list()
+
+        self.output_path = output_path
+        self.pack_file = os.path.join(
+            os.path.dirname(output_path), pack_file or f"{os.path.basename(output_path)}.pack"
+        )
+
+        self.compact = pack_compact
+
+        # Any other files already in the pack (e.g. - those of other root elements) are kept.
+        self.owned = set(owned)
+
+    def setup(self) -> Tuple["ExpansionPacker", list]:
+        return self, self.work
+
+    def abort(self):
+        """Nothing is written (or started) before finalize()."""
+        pass
+
+    def finalize(self):
+        begin = time.time()
+
+        work = {
+            os.path.relpath(os.path.join(directory, filename), self.output_path): (data, checksum)
+            for directory, filename, data, _, checksum in self.work
+        }
+
+        os.makedirs(os.path.dirname(self.pack_file), exist_ok=True)
+        if self.compact or not (os.path.isfile(self.pack_file) and is_pack(self.pack_file)):
+            index, kept = self._rewrite(work)
+        else:
+            index, kept = self._append(work)
+
+        self.elapsed = time.time() - begin
+        self.logger.info(f"Packed [{len(index)}] files into [{self.pack_file}]. Kept [{kept}].")
+
+    def _append(self, work):
+        """Append the `work` to the pack, replacing its index. Returns the new index and the number of files kept."""
+
+        with open(self.pack_file, "r+b") as f:
+            f.seek(-TRAILER.size, os.SEEK_END)
+            offset, length, _ = TRAILER.unpack(f.read(TRAILER.size))
+            f.seek(offset)
+            previous = f.read(length)
+
+            index = {path: entry for path, entry in json.loads(previous)["files"].items() if self._kept(path, work)}
+            kept = len(index)
+
+            f.seek(offset)
+            try:
+                self._write(f, work, index)
+            except BaseException:
+                # Put the previous index back so that the pack is as it was.
+                f.seek(offset)
+                f.write(previous)
+                f.write(TRAILER.pack(offset, length, MAGIC))
+                f.truncate()
+                raise
+
+        return index, kept
+
+    def _rewrite(self, work):
+        """Write a new pack with the `work` and the files (if any) that are kept from the existing one."""
+
+        existing = PackReader(self.pack_file) if os.path.isfile(self.pack_file) and is_pack(self.pack_file) else None
+        index: dict = dict()
+        kept = 0
+        try:
+            with open(f"{self.pack_file}.tmp", "wb") as f:
+                f.write(MAGIC)
+                if existing:
+                    for path, (offset, length, checksum) in existing.members.items():
+                        if self._kept(path, work):
+                            index[path] = [f.tell(), length, checksum]
+                            f.write(existing.mmap[offset : offset + length])
+                            kept += 1
+                self._write(f, work, index)
+        except BaseException:
+            if os.path.exists(f"{self.pack_file}.tmp"):
+                os.remove(f"{self.pack_file}.tmp")
+            raise
+        finally:
+            if existing:
+                existing.close()
+
+        os.replace(f"{self.pack_file}.tmp", self.pack_file)
+        return index, kept
+
+    def _kept(self, path, work):
+        """True if the file at `path` in the existing pack is not replaced by this expansion."""
+        return path not in work and path.split(os.sep)[0] not in self.owned
+
+    def _write(self, f, work, index):
+        """Write the `work` at f's position followed by the index (to which the work is added) and trailer."""
+
+        for path, (data, checksum) in work.items():
+            index[path] = [f.tell(), len(data), checksum]
+            f.write(data)
+
+        offset = f.tell()
+        f.write(json.dumps({"files": index}, separators=(",", ":")).encode())
+        f.write(TRAILER.pack(offset, f.tell() - offset, MAGIC))
+        f.truncate()
+
+
+def is_pack(filename) -> bool:
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class PackReader:
+    """Read the files of an expansion from a pack file (see ExpansionPacker).
+
+    The pack is mmap'd and its index read once. See also: contractor.ArchiveReader.
+    """
+
+    def __init__(self, pack, codec=None):
+        self.archive = pack
+        self.codec = get_codec(codec)
+
+        with open(pack, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset, length, magic = TRAILER.unpack(self.mmap[-TRAILER.size :])
+        assert magic == MAGIC, f"[{pack}] is not a pack file"
+        self.members = json.loads(self.mmap[offset : offset + length])["files"]
+
+    def load(self, filename):
+        offset, length, _ = self._member(filename)
+        return self.codec.loads(self.mmap[offset : offset + length])
+
+    def checksum(self, filename):
+        """The checksum (according to the expansion's hash_mode) of `filename`, if any."""
+        return self._member(filename)[2]
+
+    def size(self, filename):
+        return self._member(filename)[1]
+
+    def _member(self, filename):
+        try:
+            return self.members[os.path.relpath(os.path.normpath(filename), self.archive)]
+        except KeyError:
+            raise FileNotFoundError(f"[{filename}] is not in [{self.archive}]")
+
+    def close(self):
+        self.mmap.close()
+
+    def __del__(self):
+        if hasattr(self, "mmap"):
+            self.close()
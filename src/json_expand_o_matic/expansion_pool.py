@@ -1,21 +1,37 @@
 """
-Use a ProcessPoolExecutor to save the data in parallel rather than serially.
+Use a pool of processes (or threads) to save the data in parallel rather than serially.
 """
 
+import asyncio
+import collections
+import functools
 import logging
 import multiprocessing as mp
+import multiprocessing.pool
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from ctypes import POINTER, Structure, c_ubyte, cast, create_string_buffer, string_at
 from enum import Enum
 from typing import Optional, Tuple, Union
 
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 
 
 class InitArgsType(Enum):
     ArrayOfTuples = "ArrayOfTuples"
     SharedMemoryArray = "SharedMemoryArray"
+    SharedMemoryBlock = "SharedMemoryBlock"
+    # Write with threads rather than processes. Nothing needs to be shared.
+    ThreadPool = "ThreadPool"
+    AsyncIO = "AsyncIO"
 
 
 __initargsmode__ = InitArgsType.SharedMemoryArray
@@ -40,6 +56,10 @@ class WorkTuple(Structure):
         yield self.checksum
 
 
+# A SharedMemoryBlock's index has a (begin, end) pair of offsets for each element of a work tuple.
+_BLOCK_INDEX_WIDTH = 2 * len(WorkTuple._fields_)
+
+
 def _initialize(mode, data):
     global __initargsmode__
     global __work__
@@ -50,20 +70,48 @@ def _initialize(mode, data):
 
     if __initargsmode__ == InitArgsType.SharedMemoryArray:
         __unpackfunc__ = lambda request: [  # noqa: E731
-            string_at(element).decode("utf-8") for element in __work__[request]
+            # The data is written as bytes, everything else is a str.
+            string_at(element) if index == 2 else string_at(element).decode("utf-8")
+            for index, element in enumerate(__work__[request])
         ]
     elif __initargsmode__ == InitArgsType.ArrayOfTuples:
         __unpackfunc__ = lambda request: __work__[request]  # noqa: E731
+    elif __initargsmode__ == InitArgsType.SharedMemoryBlock:
+        __unpackfunc__ = _block_unpacker(*data)
+
+
+def _block_unpacker(name, count):
+    """Attach to the SharedMemoryBlock `name` holding `count` work tuples (see _prepare_shared_memory_block)."""
+
+    global __work__
+
+    # Keep a reference so that the block stays attached for the life of the worker.
+    __work__ = block = shared_memory.SharedMemory(name=name)
+    index = block.buf[: count * _BLOCK_INDEX_WIDTH * 8].cast("q")
+
+    def unpack(request):
+        offsets = index[request * _BLOCK_INDEX_WIDTH : (request + 1) * _BLOCK_INDEX_WIDTH]
+        return [
+            # The data is written directly from the block, everything else is a str.
+            block.buf[begin:end] if element == 2 else str(block.buf[begin:end], "utf-8")
+            for element, (begin, end) in enumerate(zip(offsets[0::2], offsets[1::2]))
+        ]
+
+    return unpack
 
 
 def _write_file(request):
     global __unpackfunc__
 
+    return _write_work(__unpackfunc__(request))
+
+
+def _write_work(work):
     begin = time.time()
-    directory, filename, data, checksum_filename, checksum = __unpackfunc__(request)
+    directory, filename, data, checksum_filename, checksum = work
 
     def do():
-        with open(f"{directory}/{filename}", "w") as f:
+        with open(f"{directory}/{filename}", "wb") as f:
             f.write(data)
         if checksum_filename and checksum:
             with open(f"{directory}/{checksum_filename}", "w") as f:
@@ -71,16 +119,188 @@ def _write_file(request):
 
     try:
         # Assume that the path will already exist.
-        # We'll take a hit on the first file in each new path but save the overhead
-        # of checking on each subsequent one. This assumes that most objects will
-        # have multiple nested objects.
+        # ExpansionPool.finalize() creates every directory before writing. Without it
+        # (i.e. - WorkQueue) we take a hit on the first file in each new path but save
+        # the overhead of checking on each subsequent one.
         do()
     except FileNotFoundError:
-        os.makedirs(directory, exist_ok=True)
+        makedirs(directory)
         do()
     return time.time() - begin
 
 
+def makedirs(directory):
+    """os.makedirs(directory, exist_ok=True) without its recursion (and, therefore, depth limit)."""
+
+    missing = list()
+    while directory and not os.path.isdir(directory):
+        missing.append(directory)
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+
+    for directory in reversed(missing):
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            # Another worker beat us to it.
+            pass
+
+
+def _write_chunk(write, chunk):
+    """write() each of `chunk`. Returns our worker's name and the time taken by each write."""
+    thread = threading.current_thread()
+    worker = mp.current_process().name if thread is threading.main_thread() else thread.name
+    return worker, [write(request) for request in chunk]
+
+
+# The cost of writing a file, in addition to its bytes, when scheduling the work.
+_FILE_COST = 4096
+
+
+def schedule(sizes, pool_size, chunks_per_worker=4):
+    """Split the indices of `sizes` into chunks of roughly equal cost, largest first.
+
+    Each chunk costs about 1 / (pool_size * chunks_per_worker) of the whole where the
+    cost of a file is its size plus _FILE_COST. Workers take the next chunk as they
+    finish one so the largest files are started first and the small ones fill in the
+    gaps rather than one worker being handed all of the big files.
+    """
+    order = sorted(range(len(sizes)), key=sizes.__getitem__, reverse=True)
+    target = (sum(sizes) + _FILE_COST * len(sizes)) / (pool_size * chunks_per_worker)
+
+    chunks: list = [[]]
+    cost = 0
+    for index in order:
+        if cost >= target:
+            chunks.append([])
+            cost = 0
+        chunks[-1].append(index)
+        cost += sizes[index] + _FILE_COST
+
+    return [chunk for chunk in chunks if chunk]
+
+
+def make_directories(directories, pool_size=1):
+    """Create `directories` a level at a time, each level's directories in parallel.
+
+    Parents are created before their children so that nothing fails for want of one.
+    Any missing parents outside of `directories` are created first.
+    """
+
+    directories = set(directories)
+    for parent in {os.path.dirname(directory) for directory in directories} - directories:
+        makedirs(parent)
+
+    levels = collections.defaultdict(list)
+    for directory in directories:
+        levels[directory.count(os.sep)].append(directory)
+
+    def mkdir(directory):
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            pass
+
+    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+        for depth in sorted(levels.keys()):
+            list(executor.map(mkdir, levels[depth]))
+
+
+class WorkQueue:
+    """A bounded queue of work feeding the writers while the data is still being traversed.
+
+    Each work tuple is handed to `pool` as soon as it is appended. append() blocks while
+    `size` of them are waiting to be written so that no more than `size` serialized files
+    are held in memory at once. Without a pool, append() simply writes the file.
+
+    The pool is closed by join() unless it belongs to a WorkerPool.
+    """
+
+    def __init__(self, *, pool: Optional["mp.pool.Pool"], size: int, shared: bool = False):
+        assert size > 0, f"pool_queue_size [{size}] must be positive"
+        self.pool = pool
+        self.shared = shared
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.results: list = list()
+        self.errors: list = list()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, work):
+        self.count += 1
+        if not self.pool:
+            self.results.append(_write_work(work))
+            return
+        self.slots.acquire()
+        self.pool.apply_async(_write_work, (work,), callback=self._written, error_callback=self._failed)
+
+    def join(self) -> list:
+        """Wait for everything to be written and return the time taken by each write."""
+        if self.pool:
+            # Every slot is free once every write has finished.
+            for _ in range(self.size):
+                self.slots.acquire()
+            if not self.shared:
+                self.pool.close()
+                self.pool.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.results
+
+    def abort(self):
+        """Stop writing (e.g. - because the traversal failed). The pool is terminated unless shared."""
+        if self.pool and not self.shared:
+            self.pool.terminate()
+            self.pool.join()
+
+    def _written(self, result):
+        self.results.append(result)
+        self.slots.release()
+
+    def _failed(self, error):
+        self.errors.append(error)
+        self.slots.release()
+
+
+class WorkerPool:
+    """A long-lived pool of writer processes that can be shared by any number of expand()s.
+
+    Starting a pool of processes for every expand() is expensive when the data is small.
+    A WorkerPool is started once and each expand() sends its work to it in batches
+    (see schedule()).
+
+        with WorkerPool(pool_size=4) as pool:
+            expandomatic = JsonExpandOMatic(path=data_path, pool=pool)
+            for document in documents:
+                expandomatic.expand(document, root_element=...)
+    """
+
+    def __init__(self, *, pool_ratio: Optional[float] = None, pool_size: Optional[int] = None):
+        # Unlike ExpansionPool, the default is a worker for each cpu.
+        self.pool_size = get_pool_size(pool_ratio=pool_ratio, pool_size=0 if pool_size is None else pool_size)
+        self.pool = mp.Pool(processes=self.pool_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, work: list) -> list:
+        """Write `work` in batches and return the _write_chunk() result of each."""
+        batches = [[work[i] for i in chunk] for chunk in schedule([len(w[2]) for w in work], self.pool_size)]
+        return list(self.pool.imap_unordered(functools.partial(_write_chunk, _write_work), batches))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
 class ExpansionPool:
     def __init__(
         self,
@@ -90,16 +310,45 @@ class ExpansionPool:
         pool_size: Optional[int] = None,
         pool_disable: Optional[bool] = False,
         pool_mode: Union[str, InitArgsType] = InitArgsType.SharedMemoryArray,
+        pool_queue_size: Optional[int] = None,
+        pool_workers: Optional[WorkerPool] = None,
     ):
         assert logger, "logger is required"
         self.logger = logger
         self.work: list = list()
 
-        self.init_style = InitArgsType(pool_mode)
-
-        self._set_pool_size(pool_ratio, pool_size, pool_disable)
+        # The time each worker spent writing. See _tally().
+        self.busy: dict = collections.defaultdict(float)
 
-        if self.pool_size > 1:
+        self.init_style = InitArgsType(pool_mode)
+        assert (
+            self.init_style != InitArgsType.SharedMemoryBlock or shared_memory
+        ), f"{InitArgsType.SharedMemoryBlock.value} requires multiprocessing.shared_memory (Python 3.8+)"
+
+        # Use a long-lived WorkerPool rather than starting our own.
+        self.pool_workers = pool_workers
+        if pool_workers:
+            assert not (pool_ratio or pool_size), "pool_workers cannot be used with pool_ratio or pool_size"
+            self.pool_size = pool_workers.pool_size
+        else:
+            self._set_pool_size(pool_ratio, pool_size, pool_disable)
+
+        # Write while the data is being traversed. See WorkQueue.
+        if pool_queue_size and pool_workers:
+            self.work = WorkQueue(pool=pool_workers.pool, size=pool_queue_size, shared=True)  # type: ignore
+        elif pool_queue_size:
+            pool: Optional[mp.pool.Pool] = None
+            if self.pool_size > 1 and self.init_style in [InitArgsType.ThreadPool, InitArgsType.AsyncIO]:
+                pool = mp.pool.ThreadPool(processes=self.pool_size)
+            elif self.pool_size > 1:
+                pool = mp.Pool(processes=self.pool_size)
+            self.work = WorkQueue(pool=pool, size=pool_queue_size)  # type: ignore
+
+        if isinstance(self.work, WorkQueue):
+            logger.info(f"PoolSize: [{self.pool_size}]. QueueSize [{pool_queue_size}].")
+        elif self.pool_workers:
+            logger.info(f"PoolSize: [{self.pool_size}]. Shared.")
+        elif self.pool_size > 1:
             logger.info(f"PoolSize: [{self.pool_size}]. Mode [{self.init_style.value}].")
         else:
             logger.info(f"PoolSize: [{self.pool_size}].")
@@ -110,7 +359,18 @@ class ExpansionPool:
     def finalize(self):
         begin = time.time()
 
-        if self.pool_size == 1:
+        if not isinstance(self.work, WorkQueue):
+            # Create every directory before the first file is written so that no
+            # writer has to recover from a FileNotFoundError or race the others.
+            make_directories([work[0] for work in self.work], self.pool_size)
+
+        if isinstance(self.work, WorkQueue):
+            results = self.work.join()
+
+        elif self.pool_workers:
+            results = self._tally(self.pool_workers.write(self.work))
+
+        elif self.pool_size == 1:
             _initialize(InitArgsType.ArrayOfTuples, self.work)
             results = [_write_file(i) for i in range(0, len(self.work))]
 
@@ -122,24 +382,111 @@ class ExpansionPool:
         self.work_time = sum(results)
         self.overhead = self.elapsed - self.work_time
 
+        # The fraction of the time that each worker spent writing.
+        self.utilization = {worker: busy / self.elapsed for worker, busy in sorted(self.busy.items())}
+        if self.utilization:
+            self.logger.info(
+                "Utilization: " + ", ".join(f"[{worker}] {u:.0%}" for worker, u in self.utilization.items())
+            )
+
+    def abort(self):
+        """Called instead of (or after a failed) finalize() to release whatever setup() started."""
+        if isinstance(self.work, WorkQueue):
+            self.work.abort()
+
+    def _tally(self, chunks):
+        """Gather the time taken by each write from the _write_chunk() `chunks` and sum them by worker."""
+        results = list()
+        for worker, times in chunks:
+            self.busy[worker] += sum(times)
+            results.extend(times)
+        return results
+
+    def _chunks(self):
+        return schedule([len(work[2]) for work in self.work], self.pool_size)
+
     def _pooled_processing(self):
+        if self.init_style == InitArgsType.AsyncIO and _running_loop():
+            # asyncio.run() cannot be called from within a running event loop (e.g. - that of
+            # an async caller) and we cannot await here. The thread pool is the next best thing.
+            self.logger.info(f"Mode [{self.init_style.value}] within a running event loop. Using ThreadPool.")
+            self.init_style = InitArgsType.ThreadPool
+
+        if self.init_style == InitArgsType.ThreadPool:
+            chunks = [[self.work[i] for i in chunk] for chunk in self._chunks()]
+            with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+                return self._tally(executor.map(functools.partial(_write_chunk, _write_work), chunks))
+
+        if self.init_style == InitArgsType.AsyncIO:
+            return asyncio.run(self._gather())
+
+        if self.init_style == InitArgsType.SharedMemoryBlock:
+            block = self._prepare_shared_memory_block()
+            try:
+                return self._map((block.name, len(self.work)))
+            finally:
+                block.close()
+                block.unlink()
+
         if self.init_style == InitArgsType.SharedMemoryArray:
             data = self._prepare_shared_memory_array()
         elif self.init_style == InitArgsType.ArrayOfTuples:
             data = self.work
 
-        chunksize = 1 + int(len(self.work) / self.pool_size)
+        return self._map(data)
+
+    async def _gather(self):
+        """Write each chunk in a thread, at most pool_size at once."""
+        loop = asyncio.get_running_loop()
+        chunks = [[self.work[i] for i in chunk] for chunk in self._chunks()]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return self._tally(
+                await asyncio.gather(*[loop.run_in_executor(executor, _write_chunk, _write_work, c) for c in chunks])
+            )
 
+    def _map(self, data):
         with mp.Pool(processes=self.pool_size, initializer=_initialize, initargs=(self.init_style, data)) as pool:
-            futures = pool.map(_write_file, range(0, len(self.work)), chunksize=chunksize)
-            results = [f for f in futures]
-            return results
+            return self._tally(pool.imap_unordered(functools.partial(_write_chunk, _write_file), self._chunks()))
+
+    def _prepare_shared_memory_block(self):
+        """Pack the work into a single SharedMemory block which the workers write from without copying.
+
+        The block begins with an index of int64 (begin, end) offsets for each element of each
+        work tuple followed by the elements themselves.
+        """
+        work = [
+            [component if isinstance(component, bytes) else (component or "").encode("utf-8") for component in unit]
+            for unit in self.work
+        ]
+
+        offset = len(work) * _BLOCK_INDEX_WIDTH * 8
+        block = shared_memory.SharedMemory(create=True, size=max(1, offset + sum(len(c) for u in work for c in u)))
+
+        index = block.buf[:offset].cast("q")
+        try:
+            i = 0
+            for unit in work:
+                for component in unit:
+                    block.buf[offset : offset + len(component)] = component
+                    index[i], index[i + 1] = offset, offset + len(component)
+                    offset += len(component)
+                    i += 2
+        finally:
+            # The block cannot be closed while we hold a view of it.
+            index.release()
+
+        return block
 
     def _prepare_shared_memory_array(self):
         value_list = [
             WorkTuple(
                 *[
-                    cast(create_string_buffer((component or "").encode("utf-8")), POINTER(c_ubyte))
+                    cast(
+                        create_string_buffer(
+                            component if isinstance(component, bytes) else (component or "").encode("utf-8")
+                        ),
+                        POINTER(c_ubyte),
+                    )
                     for component in work_unit
                 ]
             )
@@ -149,16 +496,33 @@ class ExpansionPool:
         return data
 
     def _set_pool_size(self, pool_ratio, pool_size, pool_disable):
-        if pool_disable:
-            self.pool_size = 1
-        elif pool_size:
-            self.pool_size = abs(pool_size)
-        elif pool_size == 0 and not pool_ratio:
-            self.pool_size = os.cpu_count()
-        elif pool_ratio:
-            assert (
-                pool_size is None
-            ), f"Programmer error: pool_ratio [{pool_ratio}] cannot be used with pool_size [{pool_size}]."
-            self.pool_size = abs(int(os.cpu_count() * pool_ratio))
-        else:
-            self.pool_size = 1
+        self.pool_size = get_pool_size(pool_ratio=pool_ratio, pool_size=pool_size, pool_disable=pool_disable)
+
+
+def _running_loop() -> bool:
+    """True if this thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def get_pool_size(
+    *, pool_ratio: Optional[float] = None, pool_size: Optional[int] = None, pool_disable: Optional[bool] = False
+) -> int:
+    """Translate the pool_* options into a number of workers."""
+
+    if pool_disable:
+        return 1
+    elif pool_size:
+        return abs(pool_size)
+    elif pool_size == 0 and not pool_ratio:
+        return os.cpu_count() or 1
+    elif pool_ratio:
+        assert (
+            pool_size is None
+        ), f"Programmer error: pool_ratio [{pool_ratio}] cannot be used with pool_size [{pool_size}]."
+        return max(1, abs(int((os.cpu_count() or 1) * pool_ratio)))
+    else:
+        return 1
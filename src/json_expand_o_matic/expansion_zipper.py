@@ -1,10 +1,14 @@
-import io
 import logging
+import multiprocessing as mp
 import os
+import time
 import zipfile
+import zlib
 from enum import Enum
 from typing import Optional, Tuple, Union
 
+from .expansion_pool import get_pool_size, make_directories
+
 
 class OutputChoice(Enum):
     KeepZip = "KeepZip"
@@ -12,6 +16,23 @@ class OutputChoice(Enum):
     Zipped = "Zipped"
 
 
+class Compression(Enum):
+    Stored = "Stored"
+    Deflated = "Deflated"
+    BZip2 = "BZip2"
+    LZMA = "LZMA"
+    Zstandard = "Zstandard"  # Python 3.14+
+
+
+_COMPRESSION = {
+    Compression.Stored: zipfile.ZIP_STORED,
+    Compression.Deflated: zipfile.ZIP_DEFLATED,
+    Compression.BZip2: zipfile.ZIP_BZIP2,
+    Compression.LZMA: zipfile.ZIP_LZMA,
+    Compression.Zstandard: getattr(zipfile, "ZIP_ZSTANDARD", None),
+}
+
+
 class ExpansionZipper:
     def __init__(
         self,
@@ -21,6 +42,9 @@ class ExpansionZipper:
         zip_root: Optional[str] = None,  # .... Where all the files are within the zip.
         zip_file: Optional[str] = None,  # .... Name of the zip file to create in `output_path`.
         zip_output: Union[str, OutputChoice] = OutputChoice.UnZipped,  # Keep zipped, unzip or both.
+        zip_compression: Union[str, Compression] = Compression.Deflated,
+        zip_compresslevel: Optional[int] = 9,  # See zipfile.ZipFile.
+        zip_pool_size: Optional[int] = None,  # Compress the entries in a pool of processes.
     ):
         assert logger, "logger is required"
         self.logger = logger
@@ -28,6 +52,12 @@ class ExpansionZipper:
 
         self.output_mode = OutputChoice(zip_output)
 
+        self.compression = _COMPRESSION[Compression(zip_compression)]
+        assert self.compression is not None, f"{Compression(zip_compression).value} is not supported by zipfile"
+        self.compresslevel = zip_compresslevel
+
+        self.pool_size = get_pool_size(pool_size=zip_pool_size)
+
         if output_path:
             if zip_file and zip_root:
                 ...
@@ -54,9 +84,34 @@ class ExpansionZipper:
     def setup(self) -> Tuple["ExpansionZipper", list]:
         return self, self.work
 
+    def abort(self):
+        """Nothing is written (or started) before finalize()."""
+        pass
+
     def finalize(self):
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, mode="a", compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zip_file:
+        os.makedirs(self.output_path, exist_ok=True)
+
+        if self.output_mode != OutputChoice.UnZipped:
+            self._zip()
+
+        if self.output_mode != OutputChoice.Zipped:
+            self._unzipped()
+
+    def _zip(self):
+        """Stream each entry straight into the zip file."""
+
+        with zipfile.ZipFile(
+            f"{self.output_path}/{self.zip_file}",
+            mode="w",
+            compression=self.compression,
+            compresslevel=self.compresslevel,
+        ) as zip_file:
+            if self.pool_size > 1 and _can_write_compressed(zip_file):
+                self._zip_pooled(zip_file)
+                return
+            if self.pool_size > 1:
+                self.logger.info("This zipfile cannot add pre-compressed entries. Compressing serially.")
+
             for directory, filename, data, checksum_filename, checksum in self.work:
                 assert data is not None
                 zip_file.writestr(f"{directory}/{filename}", data)
@@ -65,17 +120,84 @@ class ExpansionZipper:
                         f"{directory}/{checksum_filename}", checksum, compress_type=zipfile.ZIP_STORED, compresslevel=0
                     )
 
-        os.makedirs(self.output_path, exist_ok=True)
-        with open(f"{self.output_path}/{self.zip_file}", "wb") as f:
-            f.write(zip_buffer.getvalue())
+    def _zip_pooled(self, zip_file):
+        """Compress the entries in a pool of processes and add them to `zip_file` in order."""
+
+        entries = list()
+        for directory, filename, data, checksum_filename, checksum in self.work:
+            entries.append((f"{directory}/{filename}", data, self.compression, self.compresslevel))
+            if checksum is not None:
+                entries.append((f"{directory}/{checksum_filename}", checksum.encode(), zipfile.ZIP_STORED, None))
+
+        chunksize = 1 + int(len(entries) / (self.pool_size * 4))
+
+        with mp.Pool(processes=self.pool_size) as pool:
+            compressed = pool.imap(_compress, [entry[1:] for entry in entries], chunksize=chunksize)
+            for (name, data, compress_type, _), (crc, compressed_data) in zip(entries, compressed):
+                _write_compressed(zip_file, name, len(data), crc, compressed_data, compress_type)
+
+    def _unzipped(self):
+        """Write the files that extracting the zip file would, directly from the work."""
+
+        files = list()
+        for directory, filename, data, checksum_filename, checksum in self.work:
+            files.append((self._extracted(directory, filename), data))
+            if checksum is not None:
+                files.append((self._extracted(directory, checksum_filename), checksum.encode()))
+
+        make_directories({os.path.dirname(f) for f, _ in files})
+
+        for f, data in files:
+            with open(f, "wb") as fp:
+                fp.write(data)
+
+    def _extracted(self, directory, filename):
+        """Where ZipFile.extractall() would put the entry for `filename` in `directory`."""
+        path = f"{directory}/{filename}".split("/")
+        return os.path.join(self.output_path, *[component for component in path if component not in ["", ".", ".."]])
+
+
+def _can_write_compressed(zip_file) -> bool:
+    """True if _compress() & _write_compressed() can use the zipfile internals that they need.
+
+    They mirror ZipFile.writestr() with private parts of zipfile that may change (or go away)
+    in any release of Python. Without them the entries are written (and compressed) serially.
+    """
+    return hasattr(zipfile, "_get_compressor") and all(
+        hasattr(zip_file, attr) for attr in ["fp", "start_dir", "_writecheck", "_didModify", "filelist", "NameToInfo"]
+    )
+
+
+def _compress(entry):
+    """Compress `data` as ZipFile.writestr() would. Returns its crc and the compressed data."""
+    data, compress_type, compresslevel = entry
+    compressor = zipfile._get_compressor(compress_type, compresslevel)  # type: ignore
+    return zlib.crc32(data), (compressor.compress(data) + compressor.flush() if compressor else data)
+
+
+def _write_compressed(zip_file, name, size, crc, compressed, compress_type):
+    """Add an entry already compressed by _compress() to `zip_file`.
 
-        if self.output_mode == OutputChoice.Zipped:
-            return
+    This is what ZipFile.writestr() does, less the compression. The central directory is
+    assembled from zip_file.filelist when it is closed.
+    """
+    zinfo = zipfile.ZipInfo(filename=name, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = compress_type
+    zinfo.external_attr = 0o600 << 16
+    # LZMA's compressed data includes an end-of-stream marker.
+    zinfo.flag_bits = 0x02 if compress_type == zipfile.ZIP_LZMA else 0x00
+    zinfo.file_size = size
+    zinfo.compress_size = len(compressed)
+    zinfo.CRC = crc
 
-        zip_file = zipfile.ZipFile(f"{self.output_path}/{self.zip_file}")
-        zip_file.extractall(self.output_path)
+    zip_file.fp.seek(zip_file.start_dir)
+    zinfo.header_offset = zip_file.fp.tell()
+    zip_file._writecheck(zinfo)
+    zip_file._didModify = True
 
-        if self.output_mode == OutputChoice.KeepZip:
-            return
+    zip_file.fp.write(zinfo.FileHeader())
+    zip_file.fp.write(compressed)
 
-        os.remove(f"{self.output_path}/{self.zip_file}")
+    zip_file.start_dir = zip_file.fp.tell()
+    zip_file.filelist.append(zinfo)
+    zip_file.NameToInfo[zinfo.filename] = zinfo
@@ -0,0 +1,152 @@
+"""
+Keep the parsed contents of recently contracted files in memory.
+
+    cache = get_file_cache(max_bytes=256 * 1024 * 1024)
+    data = JsonExpandOMatic(path=data_path).contract(cache=cache)
+
+Each file is keyed by (absolute path, mtime, size) so that a file that has changed is
+simply a different key; its stale entry ages out of the cache like any other. The budget
+is the total size of the cached files (not of their parsed representation).
+"""
+
+import threading
+from typing import Optional, Tuple
+
+# (absolute path, mtime in ns, size in bytes)
+KeyType = Tuple[str, int, int]
+
+_DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FileCache:
+    """A thread-safe LRU cache of parsed json files with a byte budget.
+
+    get() and load() return a copy of the cached data because the Contractor
+    replaces the $refs within whatever it is given.
+    """
+
+    def __init__(self, max_bytes: int = _DEFAULT_MAX_BYTES):
+        assert max_bytes >= 0, "max_bytes cannot be negative"
+        self.max_bytes = max_bytes
+
+        # key -> data. Least recently used first.
+        self.entries: dict = dict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: KeyType, default=None):
+        """A copy of the data cached for `key` or `default`."""
+
+        with self.lock:
+            data = self.entries.pop(key, _MISSING)
+            if data is _MISSING:
+                self.misses += 1
+                return default
+            self.entries[key] = data
+            self.hits += 1
+        return copy_data(data)
+
+    def put(self, key: KeyType, data):
+        """Cache `data` (which the caller must not change hereafter) for `key`."""
+
+        with self.lock:
+            if key in self.entries or key[2] > self.max_bytes:
+                return
+            self.entries[key] = data
+            self.bytes += key[2]
+            self._evict(self.max_bytes)
+
+    def load(self, key: KeyType, load):
+        """A copy of the data cached for `key` or, if there is none, of that returned by `load()`."""
+
+        data = self.get(key, _MISSING)
+        if data is not _MISSING:
+            return data
+
+        data = load()
+        self.put(key, data)
+        return copy_data(data)
+
+    def resize(self, max_bytes: int):
+        """Change the budget, evicting whatever no longer fits."""
+
+        assert max_bytes >= 0, "max_bytes cannot be negative"
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict(max_bytes)
+
+    def clear(self):
+        """Remove every entry. The statistics are kept."""
+
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self, max_bytes):
+        while self.bytes > max_bytes:
+            key = next(iter(self.entries))
+            del self.entries[key]
+            self.bytes -= key[2]
+            self.evictions += 1
+
+
+_MISSING = object()
+
+# See get_file_cache()
+_shared: Optional[FileCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_file_cache(max_bytes: Optional[int] = None) -> FileCache:
+    """Return the process-wide FileCache, creating it on first use.
+
+    If max_bytes is given the cache is (re)sized to it. Otherwise a new cache
+    has a budget of 64MiB.
+    """
+
+    global _shared
+
+    with _shared_lock:
+        if _shared is None:
+            _shared = FileCache(_DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
+        elif max_bytes is not None:
+            _shared.resize(max_bytes)
+        return _shared
+
+
+def copy_data(data):
+    """Copy nested dicts & lists without recursion. Everything else is immutable json and is shared."""
+
+    result = [data]
+    stack = [(result, 0)]
+    while stack:
+        container, key = stack.pop()
+        value = container[key]
+        if type(value) is dict:
+            container[key] = value = dict(value)
+            stack.extend((value, k) for k, v in value.items() if type(v) is dict or type(v) is list)
+        elif type(value) is list:
+            container[key] = value = list(value)
+            stack.extend((value, k) for k, v in enumerate(value) if type(v) is dict or type(v) is list)
+    return result[0]
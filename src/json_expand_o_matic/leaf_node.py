@@ -1,4 +1,5 @@
 import enum
+import functools
 import re
 
 
@@ -130,3 +131,63 @@ class LeafNode:
             r.compiled = re.compile(r.pattern)
 
         return [r]
+
+
+class LeafNodeMatcher:
+    """Find the first LeafNode (of a list of them) that matches a string.
+
+    The patterns of the LeafNodes for each When are merged into a single
+    alternation so that one regex match does the work of a linear scan
+    while preserving its first-match-wins semantics. Patterns that cannot
+    be merged (e.g. - they use backreferences or inline flags) cause us to
+    fall back to the linear scan for that When.
+    """
+
+    # Things that would change meaning (or fail) when a pattern is embedded in a larger one.
+    unmergeable = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)")
+
+    def __init__(self, leaf_nodes):
+        self.leaf_nodes = leaf_nodes
+        self.matchers = {when: self._matcher(when) for when in LeafNode.When}
+
+    def match(self, *, string, when):
+        """Return the first LeafNode matching _string_ at _when_ or None."""
+        return self.matchers[when](string)
+
+    @classmethod
+    def get(cls, leaf_nodes):
+        """Return a (cached) LeafNodeMatcher for _leaf_nodes_."""
+        return cls._get(tuple((c, getattr(c, "compiled", None)) for c in leaf_nodes))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _get(key):
+        return LeafNodeMatcher([c for c, _ in key])
+
+    def _matcher(self, when):
+        candidates = [c for c in self.leaf_nodes if not c.comment and c.WHEN == when]
+
+        if not candidates:
+            return lambda string: None
+
+        def linear(string):
+            for c in candidates:
+                if c.match(string=string, when=when):
+                    return c
+            return None
+
+        if any(c.compiled is None or self.unmergeable.search(c.compiled.pattern) for c in candidates):
+            return linear
+
+        try:
+            merged = re.compile("|".join(f"(?P<_{i}>{c.compiled.pattern})" for i, c in enumerate(candidates)))
+        except re.error:
+            return linear
+
+        def alternation(string):
+            m = merged.match(string)
+            # The group wrapped around each pattern encloses any groups within it
+            # so it is always the last one to close.
+            return candidates[int(m.lastgroup[1:])] if m else None
+
+        return alternation
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+
+
+class TestArchive:
+    """Test contract() from zip and tar archives."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestArchive._raw_data:
+            TestArchive._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestArchive._raw_data
+
+    @pytest.fixture(params=["zip", "zip+zip_root", "tar", "tar.gz+subdirectory"])
+    def archive(self, request, tmpdir, raw_data):
+        """Return the path to the expansion within an archive."""
+
+        if request.param == "zip":
+            JsonExpandOMatic(path=f"{tmpdir}/out").expand(
+                raw_data, root_element="root", zip_root=".", zip_output="Zipped"
+            )
+            return f"{tmpdir}/out/out.zip"
+
+        if request.param == "zip+zip_root":
+            JsonExpandOMatic(path=f"{tmpdir}/out").expand(
+                raw_data, root_element="root", zip_root="foo", zip_output="Zipped"
+            )
+            return f"{tmpdir}/out/out.zip/foo"
+
+        JsonExpandOMatic(path=f"{tmpdir}/out").expand(raw_data, root_element="root", leaf_nodes=["/root/actors/.*"])
+
+        if request.param == "tar":
+            archive, mode, arcname = f"{tmpdir}/out.tar", "w", "."
+        else:
+            archive, mode, arcname = f"{tmpdir}/out.tar.gz", "w:gz", "a/b"
+
+        with tarfile.open(archive, mode) as tar:
+            tar.add(f"{tmpdir}/out", arcname=arcname)
+        shutil.rmtree(f"{tmpdir}/out")
+
+        return archive if arcname == "." else f"{archive}/{arcname}"
+
+    @pytest.mark.parametrize(
+        "contractor_options", [{}, {"lazy": True}, {"pool_size": 4}], ids=["default", "lazy", "pool_size:4"]
+    )
+    def test_contract(self, tmpdir, archive, raw_data, contractor_options):
+        # Nothing has been extracted.
+        assert not [f for _, _, filenames in os.walk(tmpdir) for f in filenames if f.endswith(".json")]
+
+        assert JsonExpandOMatic(path=archive).contract(root_element="root", **contractor_options) == raw_data
+
+    def test_process_pool(self, archive):
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=archive).contract(root_element="root", pool_size=2, pool_mode="ProcessPool")
+
+    def test_missing(self, archive):
+        with pytest.raises(FileNotFoundError):
+            JsonExpandOMatic(path=archive).contract(root_element="nothing")
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.codec import CODECS, Codec, JsonCodec, get_codec, msgspec, orjson, ujson
+
+INSTALLED = [
+    name for name, module in [("json", json), ("orjson", orjson), ("msgspec", msgspec), ("ujson", ujson)] if module
+]
+
+
+class TestCodec:
+    """Test the json codecs."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestCodec._raw_data:
+            TestCodec._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestCodec._raw_data
+
+    @pytest.fixture(params=INSTALLED)
+    def codec(self, request):
+        return request.param
+
+    def test_default(self):
+        codec = get_codec()
+        assert isinstance(codec, JsonCodec)
+        assert codec.dumps({"a": [1, 2]}) == json.dumps({"a": [1, 2]}, indent="", separators=(",", ":")).encode()
+        assert get_codec(codec) is codec
+
+    def test_unknown(self):
+        with pytest.raises(AssertionError):
+            get_codec("pickle")
+
+    def test_auto(self):
+        assert get_codec("auto").NAME == INSTALLED[1 if len(INSTALLED) > 1 else 0]
+
+    @pytest.mark.parametrize(
+        "json_dump_kwargs",
+        [None, {"sort_keys": True}, {"indent": 2}, {"indent": 2, "sort_keys": True}],
+        ids=["none", "sort_keys", "indent", "indent+sort_keys"],
+    )
+    def test_dumps(self, codec, json_dump_kwargs):
+        """Each codec's output is the same as json.dumps() with equivalent kwargs."""
+
+        data = {"b": [1, 2.5, None, True], "a": {"c": "d/e"}}
+        dumps = get_codec(codec, json_dump_kwargs).dumps(data)
+        assert isinstance(dumps, bytes)
+        assert get_codec(codec).loads(dumps) == data
+
+        if json_dump_kwargs and codec == "json":
+            assert dumps == json.dumps(data, **json_dump_kwargs).encode()
+        elif json_dump_kwargs:
+            # Unless indented, the others' output is compact.
+            separators = (",", ": ") if json_dump_kwargs.get("indent") else (",", ":")
+            assert dumps == json.dumps(data, **dict({"separators": separators}, **json_dump_kwargs)).encode()
+        else:
+            assert json.loads(dumps) == data
+
+    def test_unsupported(self, codec):
+        if codec == "json":
+            pytest.skip("The stdlib codec supports everything json.dumps() does")
+        with pytest.raises(AssertionError):
+            get_codec(codec, {"default": str})
+        with pytest.raises(AssertionError):
+            get_codec(codec, {"indent": "\t"})
+
+    def test_expand_contract(self, tmpdir, raw_data, codec):
+        expandomatic = JsonExpandOMatic(path=tmpdir, codec=codec)
+        expandomatic.expand(raw_data, root_element="root", hash_mode="HASH_MD5")
+
+        with open(f"{tmpdir}/root/actors/charlie_chaplin.json") as f:
+            assert json.load(f)["birth_year"] == 1889
+
+        assert expandomatic.contract(root_element="root") == raw_data
+
+        # The codec is pickled for the ProcessPool.
+        contractor_options = {"pool_size": 2, "pool_mode": "ProcessPool", "codec": codec}
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root", **contractor_options) == raw_data
+
+    def test_codecs(self):
+        assert sorted(CODECS.keys()) == ["json", "msgspec", "orjson", "ujson"]
+
+    def test_abstract(self):
+        with pytest.raises(TypeError):
+            Codec()  # type: ignore
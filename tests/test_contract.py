@@ -0,0 +1,219 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.contractor import Contractor, LazyDict, LazyList
+
+
+class TestContract:
+    """Test the contract() variations."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestContract._raw_data:
+            TestContract._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestContract._raw_data
+
+    @pytest.fixture
+    def original_data(self, raw_data):
+        return json.loads(json.dumps(raw_data))
+
+    @pytest.fixture(
+        params=[[], ["/root/actors/.*/movies/.*"], [{"/root/actors/.*": ["/[^/]+/movies/.*"]}]],
+        ids=["none", "movies", "nested"],
+    )
+    def expanded(self, request, tmpdir, raw_data):
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", leaf_nodes=request.param)
+        return tmpdir
+
+    @pytest.fixture
+    def slurped(self, monkeypatch):
+        """Record the files read by Contractor._slurp()."""
+
+        slurped = list()
+        slurp = Contractor._slurp
+
+        def _slurp(self, *args):
+            slurped.append("/".join(args))
+            return slurp(self, *args)
+
+        monkeypatch.setattr(Contractor, "_slurp", _slurp)
+        return slurped
+
+    def test_lazy(self, expanded, original_data, slurped):
+        contracted = JsonExpandOMatic(path=expanded).contract(root_element="root", lazy=True)
+        assert isinstance(contracted, LazyDict)
+
+        # Nothing but root.json has been read.
+        assert len(slurped) == 1
+
+        # Reading one actor reads only the files along the way.
+        charlie = contracted["actors"]["charlie_chaplin"]
+        assert charlie["first_name"] == "Charlie"
+        assert len(slurped) == 3
+
+        # Values are cached.
+        assert contracted["actors"]["charlie_chaplin"] is charlie
+        assert len(slurped) == 3
+
+        assert isinstance(charlie["filmography"], LazyList)
+        assert charlie["filmography"][0] == ["The Kid", 1921]
+
+        # Everything else is loaded on demand.
+        assert contracted == original_data
+        assert json.loads(json.dumps(contracted)) == original_data
+        assert json.loads(json.dumps(contracted, indent=2, sort_keys=True)) == original_data
+
+    def test_lazy_json_dumps(self, expanded, original_data):
+        contracted = JsonExpandOMatic(path=expanded).contract(root_element="root", lazy=True)
+        assert json.loads(json.dumps(contracted)) == original_data
+
+    @pytest.mark.parametrize(
+        "operation",
+        [
+            lambda lazy: dict(lazy),
+            lambda lazy: {**lazy},
+            lambda lazy: dict(dict().items(), **lazy),
+            lambda lazy: lazy.copy(),
+            lambda lazy: dict(zip(list(lazy), [lazy[k] for k in lazy.keys()])),
+            lambda lazy: dict([lazy.popitem()]),
+            lambda lazy: {"charlie_chaplin": lazy.setdefault("charlie_chaplin")},
+        ],
+        ids=["dict", "unpack", "kwargs", "copy", "iter+keys", "popitem", "setdefault"],
+    )
+    def test_lazy_dict(self, expanded, original_data, operation):
+        """Whatever is taken from a LazyDict has been contracted."""
+
+        actors = JsonExpandOMatic(path=expanded).contract(root_element="root", lazy=True)["actors"]
+        result = operation(actors)
+        assert result and json.loads(json.dumps(result)) == {k: original_data["actors"][k] for k in result}
+
+    @pytest.mark.parametrize(
+        "operation, expected",
+        [
+            (lambda lazy: ["The Kid", 1921] in lazy, True),
+            (lambda lazy: ["The Kid", 1922] in lazy, False),
+            (lambda lazy: list(reversed(lazy))[-1], ["The Kid", 1921]),
+            (lambda lazy: lazy.pop(), ["Modern Times", 1936]),
+            (lambda lazy: lazy.pop(0), ["The Kid", 1921]),
+            (lambda lazy: lazy.index(["Modern Times", 1936]), 2),
+            (lambda lazy: lazy.index(["The Kid", 1921], 1), ValueError),
+            (lambda lazy: lazy.count(["The Kid", 1921]), 1),
+            (lambda lazy: json.loads(json.dumps(lazy.copy()))[0], ["The Kid", 1921]),
+            (lambda lazy: (lazy + [])[0], ["The Kid", 1921]),
+            (lambda lazy: ([] + lazy)[0], ["The Kid", 1921]),
+            (lambda lazy: (lazy * 1)[0], ["The Kid", 1921]),
+            (lambda lazy: (2 * lazy)[3], ["The Kid", 1921]),
+            (
+                lambda lazy: lazy.remove(["A Woman of Paris", 1923]) or lazy,
+                [["The Kid", 1921], ["Modern Times", 1936]],
+            ),
+            (lambda lazy: lazy.remove(["The Kid", 1922]), ValueError),
+            (lambda lazy: lazy.sort(reverse=True) or list.__getitem__(lazy, 0), ["The Kid", 1921]),
+        ],
+        ids=[
+            "in",
+            "not-in",
+            "reversed",
+            "pop",
+            "pop-0",
+            "index",
+            "index-start",
+            "count",
+            "copy",
+            "add",
+            "radd",
+            "mul",
+            "rmul",
+            "remove",
+            "remove-missing",
+            "sort",
+        ],
+    )
+    def test_lazy_list(self, tmpdir, raw_data, operation, expected):
+        """Whatever is taken from (or found in) a LazyList has been contracted."""
+
+        # Each film is a file of its own.
+        JsonExpandOMatic(path=tmpdir).expand(
+            raw_data, root_element="root", leaf_nodes=["/root/actors/charlie_chaplin/filmography/.*"]
+        )
+        filmography = JsonExpandOMatic(path=tmpdir).contract(root_element="root", lazy=True)["actors"][
+            "charlie_chaplin"
+        ]["filmography"]
+        assert isinstance(list.__getitem__(filmography, 0), dict)
+
+        if expected is ValueError:
+            with pytest.raises(ValueError):
+                operation(filmography)
+        else:
+            assert operation(filmography) == expected
+
+    @pytest.mark.parametrize(
+        "contractor_options",
+        [{"pool_size": 1}, {"pool_size": 4}, {"pool_ratio": 0.5}, {"pool_size": 2, "pool_mode": "ProcessPool"}],
+        ids=["pool_size:1", "pool_size:4", "pool_ratio:0.5", "pool_size:2+pool_mode:ProcessPool"],
+    )
+    def test_pooled(self, expanded, original_data, contractor_options):
+        contracted = JsonExpandOMatic(path=expanded).contract(root_element="root", **contractor_options)
+        assert contracted == original_data
+
+    def test_pooled_breadth_first(self, expanded, slurped):
+        JsonExpandOMatic(path=expanded).contract(root_element="root", pool_size=4)
+
+        # Each level of files is read before any file of the next level.
+        depths = [len(s.split("/")) for s in slurped]
+        assert depths == sorted(depths)
+
+    @pytest.mark.parametrize(
+        "path, keys",
+        [
+            ("/root", []),
+            ("/root/actors/charlie_chaplin", ["actors", "charlie_chaplin"]),
+            ("/root/actors/charlie_chaplin/filmography/1", ["actors", "charlie_chaplin", "filmography", 1]),
+            ("/root/actors/dwayne_johnson/movies", ["actors", "dwayne_johnson", "movies"]),
+            ("/root/actors/charlie_chaplin/birth_year", ["actors", "charlie_chaplin", "birth_year"]),
+        ],
+        ids=["root", "charlie", "filmography", "movies", "scalar"],
+    )
+    @pytest.mark.parametrize("contractor_options", [{}, {"pool_size": 2}, {"lazy": True}], ids=str)
+    def test_path(self, expanded, original_data, path, keys, contractor_options):
+        subtree = original_data
+        for key in keys:
+            subtree = subtree[key]
+
+        contracted = JsonExpandOMatic(path=expanded).contract(root_element="root", path=path, **contractor_options)
+        assert contracted == subtree
+
+    def test_path_reads(self, tmpdir, raw_data, slurped):
+        """Only the files along the path, and those of the subtree, are read."""
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root")
+
+        JsonExpandOMatic(path=tmpdir).contract(root_element="root", path="/root/actors/charlie_chaplin/spouses")
+        assert [os.path.relpath(s, tmpdir) for s in slurped[:4]] == [
+            "root.json",
+            "root/actors.json",
+            "root/actors/charlie_chaplin.json",
+            "root/actors/charlie_chaplin/spouses.json",
+        ]
+        assert all("dwayne_johnson" not in s for s in slurped)
+
+    def test_path_mangled(self, tmpdir):
+        data = {"a key": {"b:c": {"d": [1, 2]}}}
+        JsonExpandOMatic(path=tmpdir).expand(data, root_element="root")
+
+        for path in ["/root/a key/b:c", "/root/a_key/b_c"]:
+            assert JsonExpandOMatic(path=tmpdir).contract(root_element="root", path=path) == {"d": [1, 2]}
+
+    def test_path_not_found(self, tmpdir, raw_data):
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root")
+
+        with pytest.raises(KeyError):
+            JsonExpandOMatic(path=tmpdir).contract(root_element="root", path="/root/actors/nobody")
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=tmpdir).contract(root_element="root", path="/toor/actors")
@@ -0,0 +1,81 @@
+import json
+import os
+
+import jsonref  # type: ignore
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+
+
+class TestDedup:
+    """Test `dedup` expansion."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestDedup._raw_data:
+            TestDedup._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestDedup._raw_data
+
+    @pytest.fixture
+    def test_data(self, raw_data):
+        return json.loads(json.dumps(raw_data))
+
+    def test_dedup(self, tmpdir, test_data):
+        expandomatic = JsonExpandOMatic(path=tmpdir)
+        expanded = expandomatic.expand(test_data, root_element="root", hash_mode="HASH_MD5", dedup=True)
+        assert expanded == {"root": {"$ref": f"{tmpdir.basename}/root.json"}}
+
+        # The root is a reference to its object.
+        with open(f"{tmpdir}/root.json") as f:
+            root_object = json.load(f)["$ref"]
+        assert root_object.startswith("objects/")
+
+        # Everything else is in the objects directory.
+        assert sorted(os.listdir(tmpdir)) == ["objects", "root.json"]
+
+        # Each of Charlie Chaplin's spouses has an identical (empty) list of children
+        # so there is one object for all of them.
+        children = [
+            f
+            for f in expandomatic.hashcodes.values()
+            if "root/actors/charlie_chaplin/spouses/lita_grey/children.json" in f
+        ]
+        assert len(children) == 1
+        assert len(children[0]) == 4
+
+        # Fewer files are written than without dedup.
+        JsonExpandOMatic(path=f"{tmpdir}/x").expand(TestDedup._raw_data, root_element="root")
+        expanded_files = [f for _, _, filenames in os.walk(f"{tmpdir}/x") for f in filenames]
+        assert len(os.listdir(f"{tmpdir}/objects")) < len(expanded_files)
+
+    @pytest.mark.parametrize("expander_options", [{}, {"pool_size": 2}], ids=["default", "pool_size:2"])
+    def test_contract(self, tmpdir, test_data, expander_options):
+        original_data = json.loads(json.dumps(test_data))
+
+        JsonExpandOMatic(path=tmpdir).expand(
+            test_data, root_element="root", hash_mode="HASH_MD5", dedup=True, **expander_options
+        )
+
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root") == original_data
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root", lazy=True) == original_data
+
+        with open(f"{tmpdir}/root.json") as f:
+            assert jsonref.load(f, base_uri=f"file://{tmpdir}/") == original_data
+
+    def test_existing_objects(self, tmpdir, test_data):
+        JsonExpandOMatic(path=tmpdir).expand(test_data, root_element="root", hash_mode="HASH_MD5", dedup=True)
+        objects = {f: os.stat(f"{tmpdir}/objects/{f}").st_mtime_ns for f in os.listdir(f"{tmpdir}/objects")}
+
+        test_data = json.loads(json.dumps(TestDedup._raw_data))
+        test_data["actors"]["dwayne_johnson"]["hobbies"]["cooking"] = True
+        JsonExpandOMatic(path=tmpdir).expand(test_data, root_element="root", hash_mode="HASH_MD5", dedup=True)
+
+        # Existing objects are not rewritten. Changes create new objects.
+        after = {f: os.stat(f"{tmpdir}/objects/{f}").st_mtime_ns for f in os.listdir(f"{tmpdir}/objects")}
+        assert {f: after[f] for f in objects} == objects
+        assert len(after) > len(objects)
+
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root") == test_data
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+
+
+class TestDepth:
+    """Test data nested more deeply than the recursion limit."""
+
+    # Deeper than the recursion limit but shallow enough that the expanded
+    # file paths do not exceed PATH_MAX.
+    depth = max(1500, sys.getrecursionlimit() + 100)
+
+    @pytest.fixture
+    def tmpdir(self, tmpdir):
+        # pytest removes old tmpdirs with shutil.rmtree() which would recurse too deeply.
+        yield tmpdir
+        self._rmtree(tmpdir)
+
+    @pytest.fixture(params=["dict", "list"])
+    def shape(self, request):
+        return request.param
+
+    @pytest.fixture
+    def deep_data(self, shape):
+        data = leaf = {"x": 1} if shape == "dict" else [1]
+        for _ in range(self.depth):
+            data = {"a": data} if shape == "dict" else [data]
+        return data, leaf
+
+    @pytest.fixture
+    def deep_json(self, shape):
+        if shape == "dict":
+            return '{"a":' * self.depth + '{"x":1}' + "}" * self.depth
+        return "[" * self.depth + "[1]" + "]" * self.depth
+
+    @pytest.mark.parametrize("preserve", [True, False])
+    def test_expand_contract(self, tmpdir, deep_data, preserve):
+        data, leaf = deep_data
+
+        expanded = JsonExpandOMatic(path=tmpdir).expand(data, root_element="root", preserve=preserve)
+        assert expanded == {"root": {"$ref": f"{tmpdir.basename}/root.json"}}
+        if preserve:
+            assert self._depth(data) == (self.depth, leaf)
+
+        contracted = JsonExpandOMatic(path=tmpdir).contract(root_element="root")
+        assert self._depth(contracted) == (self.depth, leaf)
+
+    def test_expand_stream(self, tmpdir, deep_json, deep_data):
+        pytest.importorskip("ijson")
+        _, leaf = deep_data
+
+        (tmpdir / "deep.json").write_text(deep_json, encoding="utf-8")
+        with open(tmpdir / "deep.json", "rb") as f:
+            JsonExpandOMatic(path=tmpdir / "out").expand_stream(f, root_element="root")
+
+        contracted = JsonExpandOMatic(path=tmpdir / "out").contract(root_element="root", pool_size=2)
+        assert self._depth(contracted) == (self.depth, leaf)
+
+    def _depth(self, data):
+        """Return the depth of `data` and its innermost element (without recursion)."""
+        depth = 0
+        while isinstance(data, dict) and "a" in data or isinstance(data, list) and isinstance(data[0], list):
+            data = data["a"] if isinstance(data, dict) else data[0]
+            depth += 1
+        return depth, data
+
+    def _rmtree(self, path):
+        """Remove the contents of `path` (without recursion)."""
+        directories = list()
+        stack = [str(path)]
+        while stack:
+            directories.append(stack.pop())
+            with os.scandir(directories[-1]) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        for directory in reversed(directories[1:]):
+            os.rmdir(directory)
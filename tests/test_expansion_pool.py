@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic, expansion_pool
+from json_expand_o_matic.expansion_pool import ExpansionPool, make_directories, schedule
+
+
+class TestExpansionPool:
+    """Test the ExpansionPool's directory creation and scheduling."""
+
+    def test_make_directories(self, tmpdir):
+        os.makedirs(f"{tmpdir}/exists")
+
+        make_directories(
+            [f"{tmpdir}/a/b/c", f"{tmpdir}/a", f"{tmpdir}/missing/parent", f"{tmpdir}/exists", f"{tmpdir}/a/b/c/d"],
+            pool_size=2,
+        )
+
+        assert sorted(os.path.relpath(d, tmpdir) for d, _, _ in os.walk(tmpdir))[1:] == [
+            "a",
+            "a/b",
+            "a/b/c",
+            "a/b/c/d",
+            "exists",
+            "missing",
+            "missing/parent",
+        ]
+
+    @pytest.mark.parametrize(
+        "expander_options", [{}, {"pool_size": 2}, {"pool_size": 2, "pool_mode": "ThreadPool"}], ids=str
+    )
+    def test_no_retries(self, tmpdir, resource_path_root, monkeypatch, expander_options):
+        """Every directory exists before the first file is written."""
+
+        makedirs = list()
+        monkeypatch.setattr(expansion_pool, "makedirs", makedirs.append)
+
+        data = json.loads((resource_path_root / "actor-data.json").read_text())
+        JsonExpandOMatic(path=f"{tmpdir}/out").expand(data, root_element="root", **expander_options)
+
+        # Only the parent of the expansion is created by makedirs() (which _write_file() would use).
+        assert makedirs == [str(tmpdir)]
+        assert JsonExpandOMatic(path=f"{tmpdir}/out").contract(root_element="root") == data
+
+    @pytest.mark.parametrize("pool_mode", ["SharedMemoryArray", "ThreadPool"])
+    def test_queue_aborted(self, tmpdir, pool_mode):
+        """The WorkQueue's writers are stopped if the traversal fails."""
+
+        data = {"a": {"b": 1}, "c": {"d": {1, 2}}}
+        with pytest.raises(TypeError):
+            JsonExpandOMatic(path=tmpdir).expand(
+                data, root_element="root", pool_size=2, pool_queue_size=4, pool_mode=pool_mode
+            )
+        assert not mp.active_children()
+
+    def test_asyncio_running_loop(self, tmpdir, resource_path_root):
+        """pool_mode AsyncIO works within a running event loop (by using a ThreadPool instead)."""
+
+        data = json.loads((resource_path_root / "actor-data.json").read_text())
+
+        async def expand():
+            JsonExpandOMatic(path=tmpdir).expand(data, root_element="root", pool_size=2, pool_mode="AsyncIO")
+
+        asyncio.run(expand())
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root") == data
+
+    def test_schedule(self):
+        sizes = [10, 1_000_000, 10, 10, 500_000, 10, 10, 10, 250_000, 10]
+        chunks = schedule(sizes, pool_size=2, chunks_per_worker=2)
+
+        # Every file is scheduled once, the largest first.
+        assert sorted(i for chunk in chunks for i in chunk) == list(range(len(sizes)))
+        assert chunks[0] == [1]
+        assert [i for chunk in chunks for i in chunk][:3] == [1, 4, 8]
+
+    @pytest.mark.parametrize("pool_mode", ["SharedMemoryArray", "ThreadPool", "AsyncIO"])
+    def test_utilization(self, tmpdir, resource_path_root, pool_mode):
+        data = json.loads((resource_path_root / "actor-data.json").read_text())
+
+        pool = ExpansionPool(logger=logging.getLogger(__name__), pool_size=2, pool_mode=pool_mode)
+        pool.work.extend((f"{tmpdir}/{i}", "x.json", json.dumps(data).encode(), None, None) for i in range(20))
+        pool.finalize()
+
+        assert 1 <= len(pool.utilization) <= 2
+        assert all(0 < u <= 1 for u in pool.utilization.values())
+        assert sum(pool.busy.values()) == pytest.approx(pool.work_time)
@@ -0,0 +1,124 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import FileCache, JsonExpandOMatic, get_file_cache
+from json_expand_o_matic.file_cache import copy_data
+
+
+class TestFileCache:
+    """Test the FileCache and its use by contract()."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestFileCache._raw_data:
+            TestFileCache._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestFileCache._raw_data
+
+    @pytest.fixture
+    def original_data(self, raw_data):
+        return json.loads(json.dumps(raw_data))
+
+    def test_lru(self):
+        cache = FileCache(max_bytes=100)
+
+        cache.put(("a", 0, 40), {"a": 1})
+        cache.put(("b", 0, 40), {"b": 1})
+        assert cache.get(("a", 0, 40)) == {"a": 1}
+
+        # "b" is the least recently used.
+        cache.put(("c", 0, 40), {"c": 1})
+        assert cache.get(("b", 0, 40)) is None
+        assert len(cache) == 2 and cache.bytes == 80
+
+        # Too big to be cached at all.
+        cache.put(("d", 0, 101), {"d": 1})
+        assert cache.get(("d", 0, 101)) is None
+
+        assert cache.stats() == {
+            "hits": 1,
+            "misses": 2,
+            "hit_ratio": 1 / 3,
+            "evictions": 1,
+            "entries": 2,
+            "bytes": 80,
+            "max_bytes": 100,
+        }
+
+        cache.resize(50)
+        assert len(cache) == 1 and cache.get(("c", 0, 40)) == {"c": 1}
+
+        cache.clear()
+        assert len(cache) == 0 and cache.bytes == 0
+
+    def test_copy(self):
+        data = {"a": [1, {"b": "c"}], "d": {"e": [[2]]}}
+        cache = FileCache()
+        assert cache.load(("x", 0, 10), lambda: data) == data
+
+        # Each copy's containers are its own.
+        copy = cache.get(("x", 0, 10))
+        copy["a"][1]["b"] = "changed"
+        copy["d"]["e"][0].append(3)
+        assert cache.get(("x", 0, 10)) == data
+        assert copy_data(data) == data and copy_data(data) is not data
+
+    def test_shared(self):
+        assert get_file_cache() is get_file_cache()
+        max_bytes = get_file_cache().max_bytes
+        try:
+            assert get_file_cache(max_bytes=1234).max_bytes == 1234
+        finally:
+            get_file_cache(max_bytes=max_bytes)
+
+    @pytest.mark.parametrize(
+        "contractor_options",
+        [{}, {"pool_size": 2}, {"pool_size": 2, "pool_mode": "ProcessPool"}, {"lazy": True}],
+        ids=str,
+    )
+    def test_contract(self, tmpdir, raw_data, original_data, contractor_options):
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root")
+        files = sum(len([f for f in filenames if f.endswith(".json")]) for _, _, filenames in os.walk(tmpdir))
+
+        cache = FileCache()
+        expandomatic = JsonExpandOMatic(path=tmpdir, cache=cache)
+
+        contracted = expandomatic.contract(root_element="root", **contractor_options)
+        assert contracted == original_data
+        assert (cache.hits, cache.misses) == (0, files)
+
+        # Changing the result does not change the cache.
+        contracted["actors"]["charlie_chaplin"]["first_name"] = "Chuck"
+
+        assert expandomatic.contract(root_element="root", **contractor_options) == original_data
+        assert (cache.hits, cache.misses) == (files, files)
+
+    def test_changed(self, tmpdir, raw_data):
+        """A file that has changed is read again."""
+
+        expandomatic = JsonExpandOMatic(path=tmpdir, cache=FileCache())
+        expandomatic.expand(raw_data, root_element="root")
+        assert expandomatic.contract(root_element="root")["actors"]["charlie_chaplin"]["birth_year"] == 1889
+
+        data = json.loads(json.dumps(raw_data))
+        data["actors"]["charlie_chaplin"]["birth_year"] = 18890
+        expandomatic.expand(data, root_element="root")
+        assert expandomatic.contract(root_element="root")["actors"]["charlie_chaplin"]["birth_year"] == 18890
+
+    @pytest.mark.parametrize(
+        "expander_options, path",
+        [({"zip_root": "foo", "zip_output": "Zipped"}, "out/out.zip/foo"), ({"pack_file": "out.pack"}, "out.pack")],
+        ids=["zip", "pack"],
+    )
+    def test_archive(self, tmpdir, raw_data, original_data, expander_options, path):
+        JsonExpandOMatic(path=f"{tmpdir}/out").expand(raw_data, root_element="root", **expander_options)
+
+        cache = FileCache()
+        for _ in range(2):
+            contracted = JsonExpandOMatic(path=f"{tmpdir}/{path}", cache=cache).contract(root_element="root")
+            assert contracted == original_data
+        assert cache.hits == cache.misses == len(cache)
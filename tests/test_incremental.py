@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+
+
+class TestIncremental:
+    """Test `incremental` expansion."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestIncremental._raw_data:
+            TestIncremental._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestIncremental._raw_data
+
+    @pytest.fixture
+    def test_data(self, raw_data):
+        return json.loads(json.dumps(raw_data))
+
+    @pytest.fixture
+    def expanded(self, tmpdir, raw_data):
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", hash_mode="HASH_MD5", incremental=True)
+
+        # Make it easy to see which files are written by the next expand().
+        for f in self._files(tmpdir):
+            os.utime(f, ns=(0, 0))
+
+        return tmpdir
+
+    def test_unchanged(self, expanded, test_data):
+        JsonExpandOMatic(path=expanded).expand(test_data, root_element="root", hash_mode="HASH_MD5", incremental=True)
+
+        assert self._written(expanded) == []
+
+    def test_changed(self, expanded, test_data):
+        test_data["actors"]["charlie_chaplin"]["movies"]["modern_times"]["budget"] = 1
+
+        JsonExpandOMatic(path=expanded).expand(test_data, root_element="root", hash_mode="HASH_MD5", incremental=True)
+
+        # Only the changed file is rewritten. Its parents only have $refs to it so they have not changed.
+        assert self._written(expanded) == [
+            f"{expanded}/root/actors/charlie_chaplin/movies/modern_times.json",
+            f"{expanded}/root/actors/charlie_chaplin/movies/modern_times.md5",
+        ]
+
+        assert JsonExpandOMatic(path=expanded).contract(root_element="root") == test_data
+
+    def test_removed(self, expanded, test_data):
+        del test_data["actors"]["charlie_chaplin"]["spouses"]
+        test_data["actors"]["dwayne_johnson"]["movies"] = "Too many to list"
+
+        JsonExpandOMatic(path=expanded).expand(test_data, root_element="root", hash_mode="HASH_MD5", incremental=True)
+
+        assert self._written(expanded) == [
+            f"{expanded}/root/actors/charlie_chaplin.json",
+            f"{expanded}/root/actors/charlie_chaplin.md5",
+            f"{expanded}/root/actors/dwayne_johnson.json",
+            f"{expanded}/root/actors/dwayne_johnson.md5",
+        ]
+
+        # Orphaned files and directories have been removed.
+        assert not os.path.exists(f"{expanded}/root/actors/charlie_chaplin/spouses.json")
+        assert not os.path.exists(f"{expanded}/root/actors/charlie_chaplin/spouses.md5")
+        assert not os.path.exists(f"{expanded}/root/actors/charlie_chaplin/spouses")
+        assert not os.path.exists(f"{expanded}/root/actors/dwayne_johnson/movies.json")
+        assert not os.path.exists(f"{expanded}/root/actors/dwayne_johnson/movies")
+
+        assert JsonExpandOMatic(path=expanded).contract(root_element="root") == test_data
+
+    def test_requires_hash_mode(self, tmpdir, test_data):
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=tmpdir).expand(test_data, root_element="root", incremental=True)
+
+    def test_requires_work_list(self, tmpdir, test_data):
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=tmpdir).expand(
+                test_data, root_element="root", hash_mode="HASH_MD5", incremental=True, pool_queue_size=4
+            )
+
+    def _files(self, path):
+        return sorted(os.path.join(d, f) for d, _, filenames in os.walk(path) for f in filenames)
+
+    def _written(self, path):
+        return [f for f in self._files(path) if os.stat(f).st_mtime_ns]
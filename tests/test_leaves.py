@@ -4,6 +4,7 @@ import os
 import pytest
 
 from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.leaf_node import LeafNode, LeafNodeMatcher
 
 
 class TestLeaves:
@@ -122,6 +123,39 @@ class TestLeaves:
 
         assert nested_files == flattened_files
 
+    @pytest.mark.parametrize(
+        "leaf_nodes",
+        [
+            [],
+            ["/root/actors/.*"],
+            ["<A:/root/actors/(charlie|dwayne)_[a-z]+$", ">B:/root/(actors)/.*", "A:/.*"],
+            [{"/root/actors/.*": ["/[^/]+/movies/.*", "<A:/.*"]}],
+            [{"<A:/root/actors/.*": ["/[^/]+/movies/.*"]}],
+        ],
+        ids=["none", "actors", "include", "nested", "nested-include"],
+    )
+    def test_preserve(self, tmpdir, test_data, original_data, leaf_nodes):
+        """preserve=True writes the same files as preserve=False without changing the data."""
+
+        preserved = JsonExpandOMatic(path=f"{tmpdir}/p/out").expand(
+            test_data, root_element="root", preserve=True, leaf_nodes=leaf_nodes
+        )
+        assert test_data == original_data
+
+        mangled = JsonExpandOMatic(path=f"{tmpdir}/m/out").expand(
+            test_data, root_element="root", preserve=False, leaf_nodes=leaf_nodes
+        )
+        assert preserved == mangled
+        assert self._files(f"{tmpdir}/p") == self._files(f"{tmpdir}/m")
+
+    def _files(self, path):
+        result = dict()
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename)) as f:
+                    result[os.path.relpath(os.path.join(dirpath, filename), path)] = f.read()
+        return result
+
     def test_nested2(self, tmpdir, test_data, original_data):
         """Test a targeted leaf_node exmple.
 
@@ -312,3 +346,46 @@ class TestLeaves:
         assert f(os.path.exists(f"{tmpdir}/root/actors/charlie_chaplin/movies"))
         assert f(os.path.exists(f"{tmpdir}/root/actors/dwayne_johnson/movies.json"))
         assert f(os.path.exists(f"{tmpdir}/root/actors/dwayne_johnson/movies"))
+
+
+class TestLeafNodeMatcher:
+    """Test that LeafNodeMatcher finds the same LeafNode as a linear scan."""
+
+    @pytest.fixture(
+        params=[
+            ["/root/actors/.*"],
+            ["/root/actors/[^/]+", "/root/actors/.*/movies/.*"],
+            ["/root/actors/.*/movies/.*", "/root/actors/.*"],
+            ["<A:/root/actors/(charlie|dwayne)_[a-z]+$", ">B:/root/(actors)/.*", "A:/.*"],
+            ["/root/(?P<what>actors)/.*", "#:/root/.*", "/root/(?P<what>movies)/.*"],
+            ["/root/(actors)/\\1", "/root/.*"],
+            ["(?i)/ROOT/actors/.*", "/root/.*"],
+            [{"/root/actors/.*": ["/[^/]+/movies/.*"]}, "/root/.*"],
+        ],
+        ids=["one", "two", "reversed", "groups", "named-groups", "backreference", "flags", "nested"],
+    )
+    def leaf_nodes(self, request):
+        return LeafNode.construct(request.param)
+
+    @pytest.mark.parametrize(
+        "string",
+        [
+            "",
+            "/root",
+            "/root/actors",
+            "/root/actors/charlie_chaplin",
+            "/root/actors/charlie_chaplin/movies/modern_times",
+            "/root/actors/actors",
+            "/root/movies/1",
+            "/ROOT/ACTORS/x",
+        ],
+    )
+    def test_first_match(self, leaf_nodes, string):
+        matcher = LeafNodeMatcher(leaf_nodes)
+
+        for when in LeafNode.When:
+            expected = next((c for c in leaf_nodes if not c.comment and c.match(string=string, when=when)), None)
+            assert matcher.match(string=string, when=when) is expected
+
+    def test_cached(self, leaf_nodes):
+        assert LeafNodeMatcher.get(leaf_nodes) is LeafNodeMatcher.get(list(leaf_nodes))
@@ -0,0 +1,163 @@
+import concurrent.futures
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.contractor import Contractor
+
+
+class TestManifest:
+    """Test the expansion manifest and its use by contract()."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestManifest._raw_data:
+            TestManifest._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestManifest._raw_data
+
+    @pytest.fixture
+    def original_data(self, raw_data):
+        return json.loads(json.dumps(raw_data))
+
+    @pytest.fixture
+    def slurped(self, monkeypatch):
+        """Record the files read by Contractor._slurp()."""
+
+        slurped = list()
+        slurp = Contractor._slurp
+
+        def _slurp(self, *args):
+            slurped.append(os.path.normpath(os.path.join(*args)))
+            return slurp(self, *args)
+
+        monkeypatch.setattr(Contractor, "_slurp", _slurp)
+        return slurped
+
+    @pytest.fixture(
+        params=[
+            {},
+            {"hash_mode": "HASH_MD5", "dedup": True},
+            {"zip_root": "foo", "zip_output": "Zipped"},
+            {"pack_file": "out.pack"},
+            {"pool_size": 2, "pool_queue_size": 8},
+        ],
+        ids=["default", "dedup", "zip", "pack", "queue"],
+    )
+    def expander_options(self, request):
+        return request.param
+
+    def test_manifest(self, tmpdir, raw_data):
+        leaf_nodes = [{"/root/actors/.*": ["/[^/]+/movies/.*"]}]
+        JsonExpandOMatic(path=tmpdir).expand(
+            raw_data, root_element="root", hash_mode="HASH_MD5", manifest=True, leaf_nodes=leaf_nodes
+        )
+
+        with open(f"{tmpdir}/root.manifest.json") as f:
+            manifest = json.load(f)["files"]
+
+        # One entry per file written.
+        files = {
+            os.path.relpath(os.path.join(d, f), tmpdir)
+            for d, _, filenames in os.walk(tmpdir)
+            for f in filenames
+            if f.endswith(".json") and not f.endswith(".manifest.json")
+        }
+        assert sorted(entry[0] for entry in manifest.values()) == sorted(files)
+
+        for traversal, (filename, size, checksum, leaf_node) in manifest.items():
+            assert os.path.getsize(f"{tmpdir}/{filename}") == size
+            with open(f"{tmpdir}/{filename[:-5]}.md5") as f:
+                assert f.read() == checksum
+
+        # Traversals are from the root even within a leaf node's expansion.
+        assert manifest["/root/actors/charlie_chaplin/movies/modern_times"][3] == "/[^/]+/movies/.*"
+        assert manifest["/root/actors/charlie_chaplin"][3] == "/root/actors/.*"
+        assert manifest["/root"][:1] == ["root.json"]
+
+    @pytest.mark.parametrize("contractor_options", [{}, {"pool_size": 2}, {"lazy": True}], ids=str)
+    def test_contract(self, tmpdir, raw_data, original_data, expander_options, contractor_options):
+        JsonExpandOMatic(path=f"{tmpdir}/out").expand(raw_data, root_element="root", manifest=True, **expander_options)
+
+        if "zip_root" in expander_options:
+            path = f"{tmpdir}/out/out.zip/foo"
+        elif "pack_file" in expander_options:
+            path = f"{tmpdir}/out.pack"
+        else:
+            path = f"{tmpdir}/out"
+
+        expandomatic = JsonExpandOMatic(path=path)
+        assert expandomatic.contract(root_element="root", **contractor_options) == original_data
+        charlie = expandomatic.contract(root_element="root", path="/root/actors/charlie_chaplin", **contractor_options)
+        assert charlie == original_data["actors"]["charlie_chaplin"]
+
+    def test_lookup(self, tmpdir, raw_data, slurped):
+        """With a manifest, the file of a subtree is read directly."""
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", manifest=True)
+
+        JsonExpandOMatic(path=tmpdir).contract(root_element="root", path="/root/actors/charlie_chaplin/birth_year")
+        assert slurped == [f"{tmpdir}/root/actors/charlie_chaplin.json"]
+
+        slurped.clear()
+        JsonExpandOMatic(path=tmpdir).contract(
+            root_element="root", path="/root/actors/charlie_chaplin", manifest=False
+        )
+        assert len(slurped) > 1
+
+    @pytest.mark.parametrize(
+        "contractor_options, loaded",
+        [({}, False), ({"lazy": True}, False), ({"path": "/root/actors"}, True), ({"pool_size": 2}, True)],
+        ids=str,
+    )
+    def test_load(self, tmpdir, raw_data, monkeypatch, contractor_options, loaded):
+        """The manifest is only loaded by contract() when it is needed."""
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", manifest=True)
+
+        loads = list()
+        _manifest = Contractor._manifest
+        monkeypatch.setattr(Contractor, "_manifest", lambda self: loads.append(1) or _manifest(self))
+
+        JsonExpandOMatic(path=tmpdir).contract(root_element="root", **contractor_options)
+        assert bool(loads) == loaded
+
+    def test_threads(self, tmpdir, raw_data, original_data):
+        """Concurrent lookups share (and evict from) the manifests cache safely."""
+
+        roots = [f"root{i}" for i in range(12)]
+        for root in roots:
+            JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element=root, manifest=True)
+
+        def lookup(i):
+            root = roots[i % len(roots)]
+            return JsonExpandOMatic(path=tmpdir).contract(root_element=root, path=f"/{root}/actors/charlie_chaplin")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            assert all(
+                charlie == original_data["actors"]["charlie_chaplin"] for charlie in pool.map(lookup, range(240))
+            )
+
+    def test_prefetch(self, tmpdir, raw_data, original_data, slurped):
+        """With a manifest, a pooled contract() reads every file at once, before the 2nd level."""
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", manifest=True)
+        files = {
+            os.path.join(d, f) for d, _, filenames in os.walk(tmpdir) for f in filenames if f != "root.manifest.json"
+        }
+
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root", pool_size=2) == original_data
+        assert sorted(slurped) == sorted(files)
+
+    def test_stale(self, tmpdir, raw_data):
+        """An expansion without a manifest removes the one left by a previous expansion."""
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", manifest=True)
+        assert os.path.exists(f"{tmpdir}/root.manifest.json")
+
+        JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root")
+        assert not os.path.exists(f"{tmpdir}/root.manifest.json")
@@ -0,0 +1,141 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+from json_expand_o_matic.expansion_packer import TRAILER, ExpansionPacker, PackReader
+
+
+class TestPack:
+    """Test expansion into, and contraction from, a pack file."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestPack._raw_data:
+            TestPack._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestPack._raw_data
+
+    @pytest.fixture(params=[{}, {"hash_mode": "HASH_MD5"}, {"hash_mode": "HASH_MD5", "dedup": True}], ids=str)
+    def expander_options(self, request):
+        return request.param
+
+    def test_pack(self, tmpdir, raw_data, expander_options):
+        expanded = JsonExpandOMatic(path=f"{tmpdir}/out").expand(
+            raw_data, root_element="root", pack_file="out.pack", **expander_options
+        )
+        assert expanded == {"root": {"$ref": "out/root.json"}}
+
+        # Only the pack file is written.
+        assert os.listdir(tmpdir) == ["out.pack"]
+
+        # It has the same files as a normal expansion, less the checksum files.
+        JsonExpandOMatic(path=f"{tmpdir}/files").expand(raw_data, root_element="root", **expander_options)
+        files = {
+            os.path.relpath(os.path.join(d, f), f"{tmpdir}/files"): os.path.join(d, f)
+            for d, _, filenames in os.walk(f"{tmpdir}/files")
+            for f in filenames
+            if f.endswith(".json")
+        }
+
+        pack = PackReader(f"{tmpdir}/out.pack")
+        assert sorted(pack.members.keys()) == sorted(files.keys())
+        for path, f in files.items():
+            with open(f) as fp:
+                assert pack.load(f"{tmpdir}/out.pack/{path}") == json.load(fp)
+            if expander_options.get("hash_mode") and not expander_options.get("dedup"):
+                with open(f"{f[:-5]}.md5") as fp:
+                    assert pack.checksum(f"{tmpdir}/out.pack/{path}") == fp.read()
+        pack.close()
+
+    @pytest.mark.parametrize(
+        "contractor_options", [{}, {"lazy": True}, {"pool_size": 4}], ids=["default", "lazy", "pool_size:4"]
+    )
+    def test_contract(self, tmpdir, raw_data, expander_options, contractor_options):
+        JsonExpandOMatic(path=f"{tmpdir}/out").expand(
+            raw_data, root_element="root", pack_file="out.pack", **expander_options
+        )
+
+        contracted = JsonExpandOMatic(path=f"{tmpdir}/out.pack").contract(root_element="root", **contractor_options)
+        assert contracted == raw_data
+
+    def test_cannot_mix(self, tmpdir, raw_data):
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=tmpdir).expand(raw_data, root_element="root", pack_file="out.pack", pool_size=2)
+
+    def test_roots(self, tmpdir, raw_data):
+        """Each root element in a pack is kept when another is (re)expanded."""
+
+        expandomatic = JsonExpandOMatic(path=f"{tmpdir}/out")
+        expandomatic.expand(raw_data, root_element="root", pack_file="out.pack", manifest=True)
+        expandomatic.expand(raw_data["actors"], root_element="actors", pack_file="out.pack")
+
+        contractor = JsonExpandOMatic(path=f"{tmpdir}/out.pack")
+        assert contractor.contract(root_element="root") == raw_data
+        assert contractor.contract(root_element="actors") == raw_data["actors"]
+
+        # Re-expanding a root element replaces all of its files (and only its files).
+        expandomatic.expand({"a": {"b": 1}}, root_element="root", pack_file="out.pack")
+        assert contractor.contract(root_element="root") == {"a": {"b": 1}}
+        assert contractor.contract(root_element="actors") == raw_data["actors"]
+
+        pack = PackReader(f"{tmpdir}/out.pack")
+        assert sorted(path for path in pack.members if path.startswith("root")) == ["root.json", "root/a.json"]
+        pack.close()
+        assert os.listdir(tmpdir) == ["out.pack"]
+
+    def test_append(self, tmpdir, raw_data):
+        """Expanding into a pack appends to it. Replaced files remain until it is compacted."""
+
+        expandomatic = JsonExpandOMatic(path=f"{tmpdir}/out")
+        expandomatic.expand(raw_data, root_element="root", pack_file="out.pack")
+        with open(f"{tmpdir}/out.pack", "rb") as f:
+            before = f.read()
+        index_offset = TRAILER.unpack(before[-TRAILER.size :])[0]
+
+        # The new files are written where the index was. The existing files are neither moved nor copied.
+        expandomatic.expand(raw_data["actors"], root_element="actors", pack_file="out.pack")
+        with open(f"{tmpdir}/out.pack", "rb") as f:
+            after = f.read()
+        assert after[:index_offset] == before[:index_offset]
+        pack = PackReader(f"{tmpdir}/out.pack")
+        assert min(entry[0] for path, entry in pack.members.items() if path.startswith("actors")) == index_offset
+        pack.close()
+
+        # Re-expanding a root element leaves its previous data behind ...
+        expandomatic.expand(raw_data, root_element="root", pack_file="out.pack")
+        appended = os.path.getsize(f"{tmpdir}/out.pack")
+        assert appended > len(after)
+
+        # ... until the pack is compacted.
+        expandomatic.expand(raw_data, root_element="root", pack_file="out.pack", pack_compact=True)
+        assert os.path.getsize(f"{tmpdir}/out.pack") < appended
+        assert os.listdir(tmpdir) == ["out.pack"]
+
+        contractor = JsonExpandOMatic(path=f"{tmpdir}/out.pack")
+        assert contractor.contract(root_element="root") == raw_data
+        assert contractor.contract(root_element="actors") == raw_data["actors"]
+
+    @pytest.mark.parametrize("expander_options", [{}, {"pack_compact": True}], ids=["append", "compact"])
+    def test_failed(self, tmpdir, raw_data, monkeypatch, expander_options):
+        """A pack is left as it was if writing to it fails."""
+
+        expandomatic = JsonExpandOMatic(path=f"{tmpdir}/out")
+        expandomatic.expand(raw_data, root_element="root", pack_file="out.pack")
+        with open(f"{tmpdir}/out.pack", "rb") as f:
+            before = f.read()
+
+        def _write(self, f, work, index):
+            f.write(b"partial")
+            raise OSError("No space left on device")
+
+        monkeypatch.setattr(ExpansionPacker, "_write", _write)
+        with pytest.raises(OSError):
+            expandomatic.expand(raw_data["actors"], root_element="actors", pack_file="out.pack", **expander_options)
+
+        assert os.listdir(tmpdir) == ["out.pack"]
+        with open(f"{tmpdir}/out.pack", "rb") as f:
+            assert f.read() == before
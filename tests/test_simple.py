@@ -1,5 +1,9 @@
+import hashlib
+import importlib
+import importlib.util
 import json
 import os
+import zlib
 from pathlib import Path
 
 import jsonref  # type: ignore
@@ -40,7 +44,13 @@ class TestSimple:
             {"pool_size": 1},  # pool_ratio is ignored
             {"pool_size": 2},  # pool_mode default is SharedMemoryArray
             {"pool_size": 2, "pool_mode": "ArrayOfTuples"},
+            {"pool_size": 2, "pool_mode": "SharedMemoryBlock"},
+            {"pool_size": 2, "pool_mode": "ThreadPool"},
+            {"pool_size": 2, "pool_mode": "AsyncIO"},
+            {"pool_size": 2, "pool_mode": "ThreadPool", "pool_queue_size": 4},
             {"pool_ratio": 0.5},  # pool_size must be None
+            {"pool_queue_size": 4},  # Written as they are produced
+            {"pool_size": 2, "pool_queue_size": 4},  # Written by the pool as they are produced
             # ExpansionZipper parameters.
             #   Not exercising OutputChoice yet.
             {"zip_root": "foo"},
@@ -57,8 +67,14 @@ class TestSimple:
         params=[
             {"hash_mode": None},
             {"hash_mode": "HASH_MD5"},
+            {"hash_mode": "HASH_BLAKE2B"},
+            {"hash_mode": "HASH_CRC32"},
+            pytest.param(
+                {"hash_mode": "HASH_XXHASH"},
+                marks=pytest.mark.skipif(not importlib.util.find_spec("xxhash"), reason="xxhash is not installed"),
+            ),
         ],
-        ids=["NoChecksum", "HASH_MD5"],
+        ids=["NoChecksum", "HASH_MD5", "HASH_BLAKE2B", "HASH_CRC32", "HASH_XXHASH"],
     )
     def hash_option(self, request):
         yield request.param
@@ -152,6 +168,47 @@ class TestSimple:
         # I'm not going to go any deeper. You get the idea...
         # See `test_leaves.py` for some more interesting things about the files.
 
+    def test_checksum_files(self, tmpdir, test_data, hash_option):
+        JsonExpandOMatic(path=tmpdir).expand(test_data, root_element="root", **hash_option)
+
+        suffix, checksum = {
+            None: (None, None),
+            "HASH_MD5": ("md5", lambda b: hashlib.md5(b).hexdigest()),
+            "HASH_BLAKE2B": ("blake2b", lambda b: hashlib.blake2b(b, digest_size=16).hexdigest()),
+            "HASH_CRC32": ("crc32", lambda b: f"{zlib.crc32(b):08x}"),
+            "HASH_XXHASH": ("xxh3", lambda b: importlib.import_module("xxhash").xxh3_128_hexdigest(b)),
+        }[hash_option["hash_mode"]]
+
+        json_file = Path(tmpdir) / "root" / "actors" / "charlie_chaplin.json"
+        if suffix is None:
+            assert [p.name for p in json_file.parent.glob("charlie_chaplin.*")] == ["charlie_chaplin.json"]
+            return
+
+        # The checksum file has the checksum of the bytes in the json file.
+        assert json_file.with_suffix(f".{suffix}").read_text() == checksum(json_file.read_bytes())
+
+    def test_hashcodes(self, tmpdir, test_data, hash_option):
+        if hash_option["hash_mode"] is None:
+            return
+
+        streamed = list()
+        JsonExpandOMatic(path=f"{tmpdir}/s").expand(
+            test_data, root_element="root", hashcodes_sink=lambda *args: streamed.append(args), **hash_option
+        )
+
+        # Every file is streamed to the sink once, relative to path.
+        json_files = sorted(str(p.relative_to(f"{tmpdir}/s")) for p in Path(f"{tmpdir}/s").glob("**/*.json"))
+        assert sorted(f for _, f in streamed) == json_files
+
+        # Without a sink, the files sharing a checksum are collected in hashcodes.
+        expandomatic = JsonExpandOMatic(path=f"{tmpdir}/h")
+        expandomatic.expand(test_data, root_element="root", **hash_option)
+
+        hashcodes = dict()
+        for checksum, f in streamed:
+            hashcodes.setdefault(checksum, list()).append(f)
+        assert expandomatic.hashcodes == {k: v for k, v in hashcodes.items() if len(v) > 1}
+
     def test_contract(self, tmpdir, test_data, original_data):
         expanded = JsonExpandOMatic(path=tmpdir).expand(test_data, root_element="root", preserve=False)
         assert expanded == {"root": {"$ref": f"{tmpdir.basename}/root.json"}}
@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic
+
+pytest.importorskip("ijson")
+
+
+class TestStream:
+    """Test expand_stream()."""
+
+    @pytest.fixture(
+        params=[
+            [],
+            ["/root/actors/.*"],
+            ["/root/actors/charlie_chaplin"],
+            ["/root/actors/.*/movies/.*", "/root/actors/.*/filmography"],
+            [{"/root/actors/.*": ["/[^/]+/movies/.*", "/[^/]+/filmography"]}],
+            [{"/root/actors/.*": ["/dwayne_johnson/movies", "/charlie_chaplin/spouses"]}],
+        ],
+        ids=["none", "actors", "charlie", "movies", "nested1", "nested2"],
+    )
+    def leaf_nodes(self, request):
+        yield request.param
+
+    @pytest.fixture(
+        params=[{}, {"hash_mode": "HASH_MD5"}, {"pool_size": 2}, {"zip_root": "foo"}],
+        ids=["default", "HASH_MD5", "pool_size:2", "zip_root:foo"],
+    )
+    def expander_options(self, request):
+        yield request.param
+
+    def test_equivalency(self, tmpdir, resource_path_root, leaf_nodes, expander_options):
+        """expand_stream() writes exactly the same files as expand()."""
+
+        input_file = resource_path_root / "actor-data.json"
+
+        expanded = JsonExpandOMatic(path=f"{tmpdir}/e/out").expand(
+            json.loads(input_file.read_text()), root_element="root", leaf_nodes=leaf_nodes, **expander_options
+        )
+
+        with open(input_file, "rb") as f:
+            streamed = JsonExpandOMatic(path=f"{tmpdir}/s/out").expand_stream(
+                f, root_element="root", leaf_nodes=leaf_nodes, **expander_options
+            )
+
+        assert streamed == expanded
+        assert self._files(f"{tmpdir}/s") == self._files(f"{tmpdir}/e")
+
+    @pytest.mark.parametrize(
+        "expander_options, written",
+        [
+            ({}, True),
+            ({"pool_queue_size": 4}, True),
+            ({"hash_mode": "HASH_MD5", "dedup": True}, False),
+            ({"zip_root": "foo"}, False),
+        ],
+        ids=["default", "pool_queue_size:4", "dedup", "zip_root:foo"],
+    )
+    def test_written_as_parsed(self, tmpdir, resource_path_root, monkeypatch, expander_options, written):
+        """Unless every file is needed at the end, they are written while the input is still being parsed."""
+
+        import ijson  # type: ignore
+
+        files = list()
+        basic_parse = ijson.basic_parse
+
+        def _basic_parse(*args, **kwargs):
+            events = list(basic_parse(*args, **kwargs))
+            yield from events[:-1]
+            files.extend(f for _, _, filenames in os.walk(tmpdir) for f in filenames)
+            yield events[-1]
+
+        monkeypatch.setattr(ijson, "basic_parse", _basic_parse)
+
+        with open(resource_path_root / "actor-data.json", "rb") as f:
+            JsonExpandOMatic(path=f"{tmpdir}/out").expand_stream(f, root_element="root", **expander_options)
+
+        assert ("charlie_chaplin.json" in files) == written
+
+    def test_contract(self, tmpdir, resource_path_root):
+        input_file = resource_path_root / "actor-data.json"
+
+        with open(input_file, "rb") as f:
+            expanded = JsonExpandOMatic(path=tmpdir).expand_stream(f, root_element="root")
+        assert expanded == {"root": {"$ref": f"{tmpdir.basename}/root.json"}}
+
+        assert JsonExpandOMatic(path=tmpdir).contract(root_element="root") == json.loads(input_file.read_text())
+
+    def _files(self, path):
+        result = dict()
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename)) as f:
+                    result[os.path.relpath(os.path.join(dirpath, filename), path)] = f.read()
+        return result
@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic, WorkerPool
+
+
+class TestWorkerPool:
+    """Test expansions sharing a WorkerPool."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestWorkerPool._raw_data:
+            TestWorkerPool._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestWorkerPool._raw_data
+
+    @pytest.fixture
+    def pool(self):
+        with WorkerPool(pool_size=2) as pool:
+            yield pool
+
+    @pytest.mark.parametrize("expander_options", [{}, {"pool_queue_size": 4}], ids=["batched", "pool_queue_size:4"])
+    def test_reuse(self, tmpdir, raw_data, pool, expander_options):
+        expected = self._files(JsonExpandOMatic(path=f"{tmpdir}/expected"), raw_data)
+
+        # The same pool is used by each expand() ...
+        expandomatic = JsonExpandOMatic(path=f"{tmpdir}/a", pool=pool)
+        for _ in range(3):
+            assert self._files(expandomatic, raw_data, **expander_options) == expected
+
+        # ... whether given to JsonExpandOMatic or to expand().
+        assert self._files(JsonExpandOMatic(path=f"{tmpdir}/b"), raw_data, pool=pool, **expander_options) == expected
+
+        assert JsonExpandOMatic(path=f"{tmpdir}/b").contract(root_element="root") == raw_data
+
+    def test_pool_size(self, tmpdir, raw_data, pool):
+        with pytest.raises(AssertionError):
+            JsonExpandOMatic(path=tmpdir, pool=pool).expand(raw_data, root_element="root", pool_size=2)
+
+    @pytest.mark.parametrize(
+        "expander_options, path",
+        [({"pack_file": "a.pack"}, "a.pack"), ({"zip_root": "foo", "zip_output": "Zipped"}, "a/a.zip/foo")],
+        ids=["pack", "zip"],
+    )
+    def test_archive(self, tmpdir, raw_data, pool, expander_options, path):
+        """The JsonExpandOMatic's pool is not used by (and does not prevent) a pack or zip expansion."""
+
+        JsonExpandOMatic(path=f"{tmpdir}/a", pool=pool).expand(raw_data, root_element="root", **expander_options)
+        assert JsonExpandOMatic(path=f"{tmpdir}/{path}").contract(root_element="root") == raw_data
+
+    def _files(self, expandomatic, data, **expander_options):
+        expandomatic.expand(data, root_element="root", **expander_options)
+
+        result = dict()
+        for dirpath, _, filenames in os.walk(expandomatic.path):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename)) as f:
+                    result[os.path.relpath(os.path.join(dirpath, filename), expandomatic.path)] = f.read()
+        return result
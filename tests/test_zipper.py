@@ -0,0 +1,98 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from json_expand_o_matic import JsonExpandOMatic, expansion_zipper
+
+
+class TestZipper:
+    """Test the ExpansionZipper's output choices."""
+
+    # Our raw test data.
+    _raw_data = None
+
+    @pytest.fixture
+    def raw_data(self, resource_path_root):
+        if not TestZipper._raw_data:
+            TestZipper._raw_data = json.loads((resource_path_root / "actor-data.json").read_text())
+        return TestZipper._raw_data
+
+    @pytest.fixture
+    def expected(self, tmpdir, raw_data):
+        """The files written without a zipper."""
+        JsonExpandOMatic(path=f"{tmpdir}/expected/foo").expand(raw_data, root_element="root", hash_mode="HASH_MD5")
+        return self._files(f"{tmpdir}/expected")
+
+    @pytest.mark.parametrize("zip_output", ["UnZipped", "KeepZip", "Zipped"])
+    def test_output(self, tmpdir, raw_data, expected, zip_output):
+        JsonExpandOMatic(path=f"{tmpdir}/zipped").expand(
+            raw_data, root_element="root", hash_mode="HASH_MD5", zip_root="foo", zip_output=zip_output
+        )
+
+        files = self._files(f"{tmpdir}/zipped")
+        zipped = files.pop("zipped.zip", None)
+
+        assert files == ({} if zip_output == "Zipped" else expected)
+
+        if zip_output == "UnZipped":
+            assert zipped is None
+            return
+
+        with zipfile.ZipFile(f"{tmpdir}/zipped/zipped.zip") as z:
+            assert {os.path.normpath(name): z.read(name) for name in z.namelist()} == expected
+
+    @pytest.mark.parametrize(
+        "zip_pool_size, internals",
+        [(None, True), (2, True), (2, False)],
+        ids=["serial", "zip_pool_size:2", "zip_pool_size:2+writestr"],
+    )
+    @pytest.mark.parametrize(
+        "zip_compression, compress_type",
+        [
+            ("Stored", zipfile.ZIP_STORED),
+            ("Deflated", zipfile.ZIP_DEFLATED),
+            ("BZip2", zipfile.ZIP_BZIP2),
+            ("LZMA", zipfile.ZIP_LZMA),
+            pytest.param(
+                "Zstandard",
+                getattr(zipfile, "ZIP_ZSTANDARD", None),
+                marks=pytest.mark.skipif(not hasattr(zipfile, "ZIP_ZSTANDARD"), reason="Requires Python 3.14+"),
+            ),
+        ],
+    )
+    def test_compression(
+        self, tmpdir, raw_data, expected, monkeypatch, zip_compression, compress_type, zip_pool_size, internals
+    ):
+        # Without the zipfile internals that the pool needs, the entries are written with writestr().
+        monkeypatch.setattr(expansion_zipper, "_can_write_compressed", lambda zip_file: internals)
+
+        JsonExpandOMatic(path=f"{tmpdir}/zipped").expand(
+            raw_data,
+            root_element="root",
+            hash_mode="HASH_MD5",
+            zip_root="foo",
+            zip_output="Zipped",
+            zip_compression=zip_compression,
+            zip_compresslevel=1,
+            zip_pool_size=zip_pool_size,
+        )
+
+        with zipfile.ZipFile(f"{tmpdir}/zipped/zipped.zip") as z:
+            assert z.testzip() is None
+            assert {os.path.normpath(name): z.read(name) for name in z.namelist()} == expected
+
+            # The checksum files are always stored.
+            assert {info.compress_type for info in z.infolist() if info.filename.endswith(".json")} == {compress_type}
+            assert {info.compress_type for info in z.infolist() if info.filename.endswith(".md5")} == {
+                zipfile.ZIP_STORED
+            }
+
+    def _files(self, path):
+        result = dict()
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                with open(os.path.join(dirpath, filename), "rb") as f:
+                    result[os.path.relpath(os.path.join(dirpath, filename), path)] = f.read()
+        return result